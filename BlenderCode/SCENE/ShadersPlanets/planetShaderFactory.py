@@ -19,14 +19,8 @@ from ShadersPlanets.shaders import (
 
 class PlanetShaderFactory:
     @staticmethod
-    def create_shader(name: str, noise_scale: float, noise_detail: float, color_primary: tuple, color_secondary: tuple,
-                      shader_type: str) -> bpy.types.Material:
-        mat = bpy.data.materials.new(name=name)
-        mat.use_nodes = True
-        nodes = mat.node_tree.nodes
-        node_links = mat.node_tree.links
-        nodes.clear()
-
+    def create_noise_color_ramp(nodes, node_links, noise_scale: float, noise_detail: float, color_primary: tuple,
+                                color_secondary: tuple):
         noise = nodes.new('ShaderNodeTexNoise')
         noise.inputs['Scale'].default_value = noise_scale
         noise.inputs['Detail'].default_value = noise_detail
@@ -37,6 +31,21 @@ class PlanetShaderFactory:
         color_ramp.color_ramp.elements[0].color = color_primary + (1,)
         color_ramp.color_ramp.elements[1].color = color_secondary + (1,)
 
+        node_links.new(noise.outputs['Fac'], color_ramp.inputs['Fac'])
+        return noise, color_ramp
+
+    @staticmethod
+    def create_shader(name: str, noise_scale: float, noise_detail: float, color_primary: tuple, color_secondary: tuple,
+                      shader_type: str) -> bpy.types.Material:
+        mat = bpy.data.materials.new(name=name)
+        mat.use_nodes = True
+        nodes = mat.node_tree.nodes
+        node_links = mat.node_tree.links
+        nodes.clear()
+
+        noise, color_ramp = PlanetShaderFactory.create_noise_color_ramp(
+            nodes, node_links, noise_scale, noise_detail, color_primary, color_secondary)
+
         shader_dict = {
             "glass": lambda: create_glass_shader(nodes, node_links, color_primary),
             "principled": lambda: create_principled_shader(nodes, node_links, color_primary),
@@ -58,8 +67,6 @@ class PlanetShaderFactory:
 
         output = nodes.new('ShaderNodeOutputMaterial')
 
-        node_links.new(noise.outputs['Fac'], color_ramp.inputs['Fac'])
-
         if 'Base Color' in shader.inputs:
             node_links.new(color_ramp.outputs['Color'], shader.inputs['Base Color'])
         elif 'Color' in shader.inputs:
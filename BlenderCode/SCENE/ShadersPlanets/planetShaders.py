@@ -12,6 +12,7 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(current_dir)
 
 from ShadersPlanets.planetShaderFactory import PlanetShaderFactory
+from ShadersPlanets.shaderBakeCache import ShaderBakeCache
 from ShadersPlanets.shaderConfigLoader import ShaderConfigLoader
 
 
@@ -26,17 +27,26 @@ class PlanetShaders:
         ) for name, config in configs.items()}
 
     @staticmethod
-    def apply_shader(obj):
+    def bake_shader_textures(resolution=1024):
+        config_path = os.path.join(os.path.dirname(__file__), 'planet_shader_config.json')
+        configs = ShaderConfigLoader.load_config(config_path)
+        return ShaderBakeCache.bake_configs(configs, resolution)
+
+    @staticmethod
+    def apply_shader(obj, baked_textures=None):
         config_path = os.path.join(os.path.dirname(__file__), 'planet_shader_config.json')
         configs = ShaderConfigLoader.load_config(config_path)
         shader_name = obj.get("planet_shader", "Ultra_Gas_Giant")
         if shader_name in configs:
-            obj.data.materials.clear()
-            obj.data.materials.append(PlanetShaderFactory.create_shader(
+            mat = PlanetShaderFactory.create_shader(
                 configs[shader_name].name, configs[shader_name].noise_scale, configs[shader_name].noise_detail,
                 configs[shader_name].color_primary, configs[shader_name].color_secondary,
                 configs[shader_name].shader_type
-            ))
+            )
+            if baked_textures and shader_name in baked_textures:
+                ShaderBakeCache.use_baked_texture(mat, baked_textures[shader_name])
+            obj.data.materials.clear()
+            obj.data.materials.append(mat)
 
 
 def register():
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+
+import bpy
+
+# Add parent directory to Python path
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+from ShadersPlanets.planetShaderFactory import PlanetShaderFactory
+from ShadersPlanets.shaderConfigLoader import ShaderConfig
+
+# Bump when the baked node setup changes so stale images are not reused
+BAKE_VERSION = 1
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bake_cache')
+
+
+class ShaderBakeCache:
+    @staticmethod
+    def config_hash(config: ShaderConfig, resolution: int) -> str:
+        payload = json.dumps({'config': asdict(config), 'resolution': resolution, 'version': BAKE_VERSION},
+                             sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def image_path(config: ShaderConfig, resolution: int, cache_dir: str = DEFAULT_CACHE_DIR) -> str:
+        return os.path.join(cache_dir, f"{config.name}_{ShaderBakeCache.config_hash(config, resolution)}.png")
+
+    @staticmethod
+    def bake_configs(configs, resolution: int = 1024, cache_dir: str = DEFAULT_CACHE_DIR, workers: int = None):
+        """Bakes every config missing from the cache in parallel Blender processes, returns {name: image path}"""
+        os.makedirs(cache_dir, exist_ok=True)
+        paths = {name: ShaderBakeCache.image_path(config, resolution, cache_dir) for name, config in configs.items()}
+        stale = [name for name, path in paths.items() if not os.path.exists(path)]
+        print(f"Shader bake cache: {len(paths) - len(stale)} cached, {len(stale)} to bake at {resolution}px")
+
+        def bake(name):
+            command = [
+                bpy.app.binary_path, '--background', '--factory-startup',
+                '--python', os.path.abspath(__file__), '--',
+                json.dumps(asdict(configs[name])), paths[name], str(resolution)
+            ]
+            result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+            if result.returncode != 0 or not os.path.exists(paths[name]):
+                print(f"Error baking {name}:\n{result.stdout[-2000:]}")
+                return name, False
+            return name, True
+
+        workers = workers or max(1, min(len(stale), (os.cpu_count() or 2) // 2))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for name, ok in executor.map(bake, stale):
+                if not ok:
+                    del paths[name]
+
+        return paths
+
+    @staticmethod
+    def bake_worker(config: ShaderConfig, output_path: str, resolution: int):
+        """Renders the config's noise -> color ramp result into an equirectangular UV image"""
+        scene = bpy.context.scene
+        scene.render.engine = 'CYCLES'
+        scene.cycles.samples = 1
+        scene.cycles.use_denoising = False
+
+        for obj in list(bpy.data.objects):
+            bpy.data.objects.remove(obj, do_unlink=True)
+
+        # Same UV layout as the planets' UV spheres, finer so the bake follows the sphere closely
+        bpy.ops.mesh.primitive_uv_sphere_add(radius=1.0, segments=128, ring_count=64)
+        sphere = bpy.context.active_object
+
+        mat = bpy.data.materials.new(name=config.name)
+        mat.use_nodes = True
+        nodes = mat.node_tree.nodes
+        node_links = mat.node_tree.links
+        nodes.clear()
+
+        noise, color_ramp = PlanetShaderFactory.create_noise_color_ramp(
+            nodes, node_links, config.noise_scale, config.noise_detail, config.color_primary, config.color_secondary)
+        emission = nodes.new('ShaderNodeEmission')
+        output = nodes.new('ShaderNodeOutputMaterial')
+        node_links.new(color_ramp.outputs['Color'], emission.inputs['Color'])
+        node_links.new(emission.outputs['Emission'], output.inputs['Surface'])
+
+        image = bpy.data.images.new(config.name, width=resolution * 2, height=resolution)
+        target = nodes.new('ShaderNodeTexImage')
+        target.image = image
+        nodes.active = target
+        sphere.data.materials.append(mat)
+
+        bpy.ops.object.bake(type='EMIT', margin=4)
+
+        # Write next to the final path first so a killed worker never leaves a truncated cache entry
+        temp_path = output_path + '.tmp.png'
+        image.filepath_raw = temp_path
+        image.file_format = 'PNG'
+        image.save()
+        os.replace(temp_path, output_path)
+
+    @staticmethod
+    def use_baked_texture(mat: bpy.types.Material, image_path: str):
+        """Replaces the material's noise and color ramp nodes with a single baked image lookup"""
+        nodes = mat.node_tree.nodes
+        node_links = mat.node_tree.links
+        noise = next((node for node in nodes if node.type == 'TEX_NOISE'), None)
+        color_ramp = next((node for node in nodes if node.type == 'VALTORGB'), None)
+        if noise is None or color_ramp is None:
+            return
+
+        image_node = nodes.new('ShaderNodeTexImage')
+        image_node.image = bpy.data.images.load(image_path, check_existing=True)
+        image_node.interpolation = 'Linear'
+
+        for link in list(color_ramp.outputs['Color'].links):
+            node_links.new(image_node.outputs['Color'], link.to_socket)
+
+        nodes.remove(noise)
+        nodes.remove(color_ramp)
+
+
+if __name__ == "__main__" and '--' in sys.argv:
+    worker_args = sys.argv[sys.argv.index('--') + 1:]
+    worker_config = json.loads(worker_args[0])
+    worker_config['color_primary'] = tuple(worker_config['color_primary'])
+    worker_config['color_secondary'] = tuple(worker_config['color_secondary'])
+    ShaderBakeCache.bake_worker(ShaderConfig(**worker_config), worker_args[1], int(worker_args[2]))
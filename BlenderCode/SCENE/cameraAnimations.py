@@ -1,7 +1,15 @@
+import os
+import sys
+
 import bpy
+import numpy as np
 from mathutils import Vector
 from math import sin, cos, pi
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sceneReconciler import CAMERA_KEY_PREFIX, SceneReconciler, pipeline_key, set_keyframes, set_properties
+
 def create_camera(name, location, lens=35):
     """Creates a camera with specific settings and returns it"""
     bpy.ops.object.camera_add(location=location)
@@ -15,62 +23,69 @@ def create_camera(name, location, lens=35):
 
     return camera
 
-def setup_main_camera(frame_start, frame_end):
-    """Sets up the main tracking camera with smooth movement"""
-    main_cam = create_camera("MainCamera", (0, -15, 8))
-
-    # Create target for camera to track
+def create_camera_target():
+    """Creates the empty the main camera tracks"""
     bpy.ops.object.empty_add(type='PLAIN_AXES')
     focus_target = bpy.context.active_object
     focus_target.name = "CameraTarget"
+    return focus_target
 
-    # Set up tracking constraint
-    track = main_cam.constraints.new(type='TRACK_TO')
-    track.target = focus_target
-    track.track_axis = 'TRACK_NEGATIVE_Z'
-    track.up_axis = 'UP_Y'
-
-    # Animate camera and target
-    for frame in range(frame_start, frame_end + 1):
-        t = (frame - frame_start) / (frame_end - frame_start)
-
-        # Camera movement
-        main_cam.location = (
-            t * 25.0 - 5 + sin(t * 2 * pi) * 3,  # X: Follow movement with wave
-            -15 + sin(t * pi) * 5,               # Y: Gentle sway
-            8 + sin(t * 4 * pi) * 2              # Z: Slight up/down motion
-        )
+def setup_main_camera(frame_start, frame_end, reconciler=None):
+    """Sets up the main tracking camera with smooth movement"""
+    reconciler = reconciler or SceneReconciler(CAMERA_KEY_PREFIX)
+    main_cam = reconciler.ensure(f"{CAMERA_KEY_PREFIX}main", lambda: create_camera("MainCamera", (0, -15, 8)))
 
-        # Target movement
-        focus_target.location = (
-            t * 25.0,                            # X: Follow main movement
-            sin(t * 2 * pi) * 2,                 # Y: Smooth weaving
-            2 + sin(t * 3 * pi)                  # Z: Height variation
-        )
+    # Create target for camera to track
+    focus_target = reconciler.ensure(f"{CAMERA_KEY_PREFIX}target", create_camera_target)
 
-        # Insert keyframes
-        main_cam.keyframe_insert(data_path="location", frame=frame)
-        focus_target.keyframe_insert(data_path="location", frame=frame)
+    # Set up tracking constraint
+    track = main_cam.constraints.get("Track To") or main_cam.constraints.new(type='TRACK_TO')
+    changed = set_properties(track, target=focus_target, track_axis='TRACK_NEGATIVE_Z', up_axis='UP_Y')
 
-        # Animate focal length for dynamic shots
-        main_cam.data.lens = 35 + sin(t * 2 * pi) * 15
-        main_cam.data.keyframe_insert(data_path="lens", frame=frame)
+    # Animate camera and target
+    frames = np.arange(frame_start, frame_end + 1)
+    t = (frames - frame_start) / (frame_end - frame_start)
+
+    # Camera movement
+    camera_locations = np.column_stack([
+        t * 25.0 - 5 + np.sin(t * 2 * pi) * 3,  # X: Follow movement with wave
+        -15 + np.sin(t * pi) * 5,               # Y: Gentle sway
+        8 + np.sin(t * 4 * pi) * 2              # Z: Slight up/down motion
+    ])
+
+    # Target movement
+    target_locations = np.column_stack([
+        t * 25.0,                               # X: Follow main movement
+        np.sin(t * 2 * pi) * 2,                 # Y: Smooth weaving
+        2 + np.sin(t * 3 * pi)                  # Z: Height variation
+    ])
+
+    # Animate focal length for dynamic shots
+    lenses = 35 + np.sin(t * 2 * pi) * 15
 
     # Ensure looping by matching the first and last frames
-    main_cam.location = (0, -15, 8)
-    focus_target.location = (0, 0, 2)
-    main_cam.data.lens = 35
-    main_cam.keyframe_insert(data_path="location", frame=frame_end)
-    focus_target.keyframe_insert(data_path="location", frame=frame_end)
-    main_cam.data.keyframe_insert(data_path="lens", frame=frame_end)
+    camera_locations[-1] = (0, -15, 8)
+    target_locations[-1] = (0, 0, 2)
+    lenses[-1] = 35
+
+    changed |= set_keyframes(main_cam, "location", frames, camera_locations)
+    changed |= set_keyframes(main_cam.data, "lens", frames, lenses)
+    reconciler.mark_updated(pipeline_key(main_cam), changed)
+    reconciler.mark_updated(pipeline_key(focus_target),
+                            set_keyframes(focus_target, "location", frames, target_locations))
 
     return main_cam
 
-def setup_orbit_camera(frame_start, frame_end):
+def setup_orbit_camera(frame_start, frame_end, reconciler=None):
     """Sets up an orbiting camera for sweeping shots"""
-    orbit_cam = create_camera("OrbitCamera", (0, -10, 5), lens=50)
-
-    for frame in range(frame_start, frame_end + 1):
+    reconciler = reconciler or SceneReconciler(CAMERA_KEY_PREFIX)
+    orbit_cam = reconciler.ensure(f"{CAMERA_KEY_PREFIX}orbit",
+                                  lambda: create_camera("OrbitCamera", (0, -10, 5), lens=50))
+
+    frames = np.arange(frame_start, frame_end + 1)
+    locations = []
+    rotations = []
+    for frame in frames:
         t = (frame - frame_start) / (frame_end - frame_start)
 
         # Smooth spiral orbit movement
@@ -79,36 +94,33 @@ def setup_orbit_camera(frame_start, frame_end):
         height = 5 + sin(t * pi) * 3
 
         # Calculate position
-        orbit_cam.location = (
+        location = Vector((
             radius * cos(angle),
             radius * sin(angle),
             height
-        )
+        ))
 
         # Point camera at the action
         look_at = Vector((t * 25.0, 0, 2))
-        direction = look_at - Vector(orbit_cam.location)
+        direction = look_at - location
         rot_quat = direction.to_track_quat('-Z', 'Y')
-        orbit_cam.rotation_euler = rot_quat.to_euler()
-
-        # Insert keyframes
-        orbit_cam.keyframe_insert(data_path="location", frame=frame)
-        orbit_cam.keyframe_insert(data_path="rotation_euler", frame=frame)
+        locations.append(location[:])
+        rotations.append(rot_quat.to_euler()[:])
 
     # Ensure looping by matching the first and last frames
-    orbit_cam.location = (0, -10, 5)
-    orbit_cam.rotation_euler = (0, 0, 0)
-    orbit_cam.keyframe_insert(data_path="location", frame=frame_end)
-    orbit_cam.keyframe_insert(data_path="rotation_euler", frame=frame_end)
+    locations[-1] = (0, -10, 5)
+    rotations[-1] = (0, 0, 0)
+
+    changed = set_keyframes(orbit_cam, "location", frames, locations)
+    changed |= set_keyframes(orbit_cam, "rotation_euler", frames, rotations)
+    reconciler.mark_updated(pipeline_key(orbit_cam), changed)
 
     return orbit_cam
 
 def setup_cameras(spheres):
     """Main function to set up all cameras and bind them to markers"""
-    # Clear existing cameras
-    for obj in bpy.data.objects:
-        if obj.type == 'CAMERA':
-            bpy.data.objects.remove(obj, do_unlink=True)
+    # Cameras of an earlier run are updated in place instead of being recreated
+    reconciler = SceneReconciler(CAMERA_KEY_PREFIX)
 
     # Scene settings
     scene = bpy.context.scene
@@ -118,8 +130,9 @@ def setup_cameras(spheres):
     scene.frame_end = frame_end
 
     # Create cameras
-    main_cam = setup_main_camera(frame_start, frame_end)
-    orbit_cam = setup_orbit_camera(frame_start, frame_end)
+    main_cam = setup_main_camera(frame_start, frame_end, reconciler)
+    orbit_cam = setup_orbit_camera(frame_start, frame_end, reconciler)
+    reconciler.remove_stale()
 
     # Clear existing markers
     scene.timeline_markers.clear()
@@ -158,6 +171,31 @@ def setup_cameras(spheres):
 
     return main_cam, orbit_cam
 
+def get_shot_ranges(scene):
+    """Returns (name, camera, frame_start, frame_end) for every camera marker, in frame order"""
+    markers = sorted((marker for marker in scene.timeline_markers if marker.camera), key=lambda m: m.frame)
+    markers = [marker for marker in markers if marker.frame <= scene.frame_end]
+
+    shots = []
+    if not markers or markers[0].frame > scene.frame_start:
+        first_end = markers[0].frame - 1 if markers else scene.frame_end
+        shots.append(("Scene Camera", scene.camera, scene.frame_start, first_end))
+
+    for index, marker in enumerate(markers):
+        start = max(marker.frame, scene.frame_start)
+        end = markers[index + 1].frame - 1 if index + 1 < len(markers) else scene.frame_end
+        if end >= start:
+            shots.append((marker.name, marker.camera, start, end))
+
+    return shots
+
+def get_shot_at_frame(scene, frame):
+    """Returns the (name, camera, frame_start, frame_end) shot that contains the given frame"""
+    for shot in get_shot_ranges(scene):
+        if shot[2] <= frame <= shot[3]:
+            return shot
+    return ("Scene Camera", scene.camera, frame, frame)
+
 def main():
     print("Setting up enhanced camera system...")
 
@@ -1,8 +1,31 @@
 import math
+import os
 import random
+import sys
+
 import bpy
+import numpy as np
 from mathutils import Color
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sceneReconciler import (
+    LIGHT_KEY_PREFIX,
+    PLANET_KEY_PREFIX,
+    SceneReconciler,
+    owned_objects,
+    pipeline_key,
+    set_keyframes,
+    set_properties
+)
+
+LIGHT_FRAMES = 250
+LIGHT_SEED = 3
+
+# Named so re-running the lighting finds the glow nodes instead of stacking new ones
+GLOW_EMISSION_NODE = "Planet Glow Emission"
+GLOW_MIX_NODE = "Planet Glow Mix"
+
 def create_volumetric_atmosphere():
     """Creates a volumetric atmosphere in the world settings for enhanced depth and atmosphere"""
     world = bpy.context.scene.world
@@ -39,25 +62,37 @@ def create_volumetric_atmosphere():
     links.new(volume_scatter.outputs['Volume'], add_shader.inputs[0])
     links.new(volume_absorption.outputs['Volume'], add_shader.inputs[1])
 
+def create_light(light_type, location):
+    """Adds a light object of the given type"""
+    bpy.ops.object.light_add(type=light_type, location=location)
+    return bpy.context.active_object
+
 def create_rim_light(target_object, intensity=2.0, color=(1.0, 0.6, 0.3, 1.0)):
     """Creates a rim light to highlight the edges of planets"""
-    bpy.ops.object.light_add(type='AREA', location=(3, -3, 0))
-    rim_light = bpy.context.active_object
-    rim_light.data.energy = intensity * 100
-    rim_light.data.color = color[:3]
-    rim_light.data.shape = 'DISK'
-    rim_light.data.size = 5
+    rim_light = create_light('AREA', (3, -3, 0))
+    update_rim_light(rim_light, target_object, intensity, color)
+    return rim_light
+
+def update_rim_light(rim_light, target_object, intensity=2.0, color=(1.0, 0.6, 0.3, 1.0)):
+    """Sets a rim light's data and target in place; returns True if anything changed"""
+    changed = set_properties(rim_light.data, energy=intensity * 100, color=color[:3], shape='DISK', size=5)
 
     # Create track-to constraint to always point at the planet
-    constraint = rim_light.constraints.new('TRACK_TO')
-    constraint.target = target_object
-    constraint.track_axis = 'TRACK_NEGATIVE_Z'
-    constraint.up_axis = 'UP_Y'
+    constraint = rim_light.constraints.get("Track To") or rim_light.constraints.new('TRACK_TO')
+    changed |= set_properties(constraint, target=target_object, track_axis='TRACK_NEGATIVE_Z', up_axis='UP_Y')
 
-    return rim_light
+    return changed
 
-def setup_enhanced_lighting():
+def rim_light_key(planet):
+    """Keys a rim light by its planet, so both are kept or removed together"""
+    key = pipeline_key(planet)
+    suffix = key[len(PLANET_KEY_PREFIX):] if key and key.startswith(PLANET_KEY_PREFIX) else planet.name
+    return f"{LIGHT_KEY_PREFIX}rim/{suffix}"
+
+def setup_enhanced_lighting(reconciler=None):
     """Sets up an enhanced lighting system with a controlled number of light sources."""
+    reconciler = reconciler or SceneReconciler(LIGHT_KEY_PREFIX)
+
     # Ensure we have a world
     if not bpy.data.worlds:
         world = bpy.data.worlds.new("World")
@@ -67,64 +102,62 @@ def setup_enhanced_lighting():
     create_volumetric_atmosphere()
 
     # Create main directional light (sun)
-    bpy.ops.object.light_add(type='SUN', location=(10, 10, 20))
-    sun = bpy.context.active_object
-    sun.data.energy = 5.0
-    sun.data.color = (1, 0.95, 0.9)  # Warm sunlight
-    sun.data.angle = 0.1  # Softer shadows
+    sun = reconciler.ensure(f"{LIGHT_KEY_PREFIX}sun", lambda: create_light('SUN', (10, 10, 20)))
+    reconciler.mark_updated(pipeline_key(sun), set_properties(
+        sun.data,
+        energy=5.0,
+        color=(1, 0.95, 0.9),  # Warm sunlight
+        angle=0.1  # Softer shadows
+    ))
 
     # Create a fill light (blue-tinted)
-    bpy.ops.object.light_add(type='SUN', location=(-10, -10, 10))
-    fill_light = bpy.context.active_object
-    fill_light.data.energy = 2.0
-    fill_light.data.color = (0.7, 0.8, 1.0)  # Cool fill light
-    fill_light.data.angle = 0.3
+    fill_light = reconciler.ensure(f"{LIGHT_KEY_PREFIX}fill", lambda: create_light('SUN', (-10, -10, 10)))
+    reconciler.mark_updated(pipeline_key(fill_light), set_properties(
+        fill_light.data,
+        energy=2.0,
+        color=(0.7, 0.8, 1.0),  # Cool fill light
+        angle=0.3
+    ))
 
     # Limit the number of area lights to 2 or 3
     area_lights_count = 2  # Change this number to control the number of area lights
 
-    for _ in range(area_lights_count):
-        bpy.ops.object.light_add(type='AREA', location=(0, 0, 15))
-        area_light = bpy.context.active_object
-        area_light.data.energy = 300.0
-        area_light.data.color = (1, 1, 1)
-        area_light.scale = (15, 15, 15)
-        area_light.data.spread = 90  # Wide spread for soft lighting
-
-    # Create animated point lights for dynamic lighting
+    for i in range(area_lights_count):
+        area_light = reconciler.ensure(f"{LIGHT_KEY_PREFIX}area/{i}", lambda: create_light('AREA', (0, 0, 15)))
+        changed = set_properties(area_light, scale=(15, 15, 15))
+        changed |= set_properties(
+            area_light.data,
+            energy=300.0,
+            color=(1, 1, 1),
+            spread=math.pi  # Widest spread for soft lighting
+        )
+        reconciler.mark_updated(pipeline_key(area_light), changed)
+
+    # Orbital motion and pulsing energy shared by the animated point lights
+    frames = np.arange(LIGHT_FRAMES)
+    angle = (frames / LIGHT_FRAMES) * 2 * math.pi
+    radius = 5 + np.sin(frames * 0.1) * 2
+    locations = np.column_stack([np.cos(angle) * radius, np.sin(angle) * radius, 5 + np.sin(frames * 0.05) * 3])
+    energies = 200 + np.sin(frames * 0.1) * 100
+
+    # Create animated point lights for dynamic lighting, seeded so a re-run keeps their colors
+    rng = random.Random(LIGHT_SEED)
     lights = []
     num_point_lights = 3  # Limiting the number of point lights to 3
     for i in range(num_point_lights):
-        bpy.ops.object.light_add(type='POINT', location=(random.uniform(-10, 10),
-                                                         random.uniform(-10, 10),
-                                                         random.uniform(5, 15)))
-        point_light = bpy.context.active_object
-        point_light.data.energy = random.uniform(100, 300)
+        location = (rng.uniform(-10, 10), rng.uniform(-10, 10), rng.uniform(5, 15))
+        point_light = reconciler.ensure(f"{LIGHT_KEY_PREFIX}point/{i}", lambda: create_light('POINT', location))
 
         # Create random color for point light
-        hue = random.random()
+        hue = rng.random()
         color = Color()
         color.hsv = (hue, 0.8, 1.0)
-        point_light.data.color = (color.r, color.g, color.b)
+        changed = set_properties(point_light.data, color=(color.r, color.g, color.b))
 
         # Add animation
-        point_light.animation_data_create()
-        frames = 250
-
-        for frame in range(frames):
-            # Orbital motion
-            angle = (frame / frames) * 2 * math.pi
-            radius = 5 + math.sin(frame * 0.1) * 2
-            x = math.cos(angle) * radius
-            y = math.sin(angle) * radius
-            z = 5 + math.sin(frame * 0.05) * 3
-
-            point_light.location = (x, y, z)
-            point_light.keyframe_insert(data_path="location", frame=frame)
-
-            # Animate energy/intensity
-            point_light.data.energy = 200 + math.sin(frame * 0.1) * 100
-            point_light.data.keyframe_insert(data_path="energy", frame=frame)
+        changed |= set_keyframes(point_light, "location", frames, locations)
+        changed |= set_keyframes(point_light.data, "energy", frames, energies)
+        reconciler.mark_updated(pipeline_key(point_light), changed)
 
         lights.append(point_light)
 
@@ -138,56 +171,98 @@ def setup_enhanced_lighting():
     return {'sun': sun, 'fill': fill_light, 'area_lights': area_lights_count, 'point_lights': lights}
 
 
+def add_planet_glow(material):
+    """Mixes a subtle emission into a planet material, reusing the nodes added by an earlier run"""
+    nodes = material.node_tree.nodes
+    links = material.node_tree.links
+
+    # Get the existing output node
+    output = None
+    for node in nodes:
+        if node.type == 'OUTPUT_MATERIAL':
+            output = node
+            break
+    if output is None:
+        return False
+
+    changed = False
+    emission = nodes.get(GLOW_EMISSION_NODE)
+    if emission is None:
+        emission = nodes.new('ShaderNodeEmission')
+        emission.name = GLOW_EMISSION_NODE
+        changed = True
+
+    mix = nodes.get(GLOW_MIX_NODE)
+    if mix is None and output.inputs['Surface'].links:
+        mix = nodes.new('ShaderNodeMixShader')
+        mix.name = GLOW_MIX_NODE
+
+        # Store existing shader connection
+        existing_shader = output.inputs['Surface'].links[0].from_node
+
+        # Create new connections
+        links.new(existing_shader.outputs[0], mix.inputs[1])
+        links.new(emission.outputs[0], mix.inputs[2])
+        links.new(mix.outputs[0], output.inputs['Surface'])
+        changed = True
+    if mix is None:
+        return changed
+
+    # Add subtle emission to existing shader
+    changed |= set_properties(emission.inputs['Color'], default_value=(1, 1, 1, 1))
+    changed |= set_properties(emission.inputs['Strength'], default_value=0.1)
+    changed |= set_properties(mix.inputs['Fac'], default_value=0.1)
+    return changed
+
+
 def apply_lighting_to_planets(planets):
     """Applies enhanced lighting effects to each planet"""
+    for _ in iter_apply_lighting_to_planets(planets):
+        pass
+
+
+def iter_apply_lighting_to_planets(planets, reconciler=None):
+    """Applies enhanced lighting effects to each planet, yielding after each one"""
+    reconciler = reconciler or SceneReconciler(LIGHT_KEY_PREFIX)
     for planet in planets:
-        # Create rim light for each planet
-        rim_light = create_rim_light(planet)
+        # Create or update the rim light of each planet
+        key = rim_light_key(planet)
+        rim_light = reconciler.ensure(key, lambda: create_rim_light(planet))
+        changed = update_rim_light(rim_light, planet)
 
         # Add emission to planet material for subtle glow
         if planet.data.materials:
             material = planet.data.materials[0]
-            if material.use_nodes:
-                nodes = material.node_tree.nodes
-                links = material.node_tree.links
-
-                # Add subtle emission to existing shader
-                emission = nodes.new('ShaderNodeEmission')
-                emission.inputs['Color'].default_value = (1, 1, 1, 1)
-                emission.inputs['Strength'].default_value = 0.1
-
-                mix = nodes.new('ShaderNodeMixShader')
-                mix.inputs['Fac'].default_value = 0.1
-
-                # Get the existing output node
-                output = None
-                for node in nodes:
-                    if node.type == 'OUTPUT_MATERIAL':
-                        output = node
-                        break
-
-                if output:
-                    # Store existing shader connection
-                    existing_shader = output.inputs['Surface'].links[0].from_node
-
-                    # Create new connections
-                    links.new(existing_shader.outputs[0], mix.inputs[1])
-                    links.new(emission.outputs[0], mix.inputs[2])
-                    links.new(mix.outputs[0], output.inputs['Surface'])
+            if material is not None and material.use_nodes:
+                changed |= add_planet_glow(material)
+        reconciler.mark_updated(key, changed)
 
-def main():
+        yield planet
+
+def build_steps():
+    """Sets up the lighting in small work units, yielding the stage progress (0 to 1) after each"""
     print("Setting up enhanced lighting system...")
 
+    # Lights of an earlier run are updated in place, rim lights of removed planets go with them
+    reconciler = SceneReconciler(LIGHT_KEY_PREFIX)
+
     # Set up the main lighting
-    lights = setup_enhanced_lighting()
+    lights = setup_enhanced_lighting(reconciler)
+    yield 0.2
 
-    # Get all planet objects in the scene
-    planets = [obj for obj in bpy.data.objects if obj.type == 'MESH']
+    # Get the planet objects owned by the planet stage
+    planets = [planet for key, planet in sorted(owned_objects(PLANET_KEY_PREFIX).items()) if planet.type == 'MESH']
 
     # Apply enhanced lighting to planets
-    apply_lighting_to_planets(planets)
+    for index, planet in enumerate(iter_apply_lighting_to_planets(planets, reconciler)):
+        yield 0.2 + 0.8 * (index + 1) / len(planets)
 
+    reconciler.remove_stale()
     print("Enhanced lighting setup completed successfully.")
 
+def main():
+    for _ in build_steps():
+        pass
+
 if __name__ == "__main__":
     main()
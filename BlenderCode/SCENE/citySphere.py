@@ -1,16 +1,37 @@
-import math
 import os
 import random
 import sys
 
 import bpy
+import numpy as np
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from ShadersPlanets.planetShaders import PlanetShaders, register
+from ShadersPlanets.shaderConfigLoader import ShaderConfigLoader
+from planetMeshGenerator import create_planet
+from planetSwarm import create_swarm, worm_trajectories
+from sceneReconciler import PLANET_KEY_PREFIX, SceneReconciler, adopt_scene, pipeline_key, set_keyframes
 
+# Replace the procedural noise of every planet material with a cached baked texture
+BAKE_SHADER_TEXTURES = False
+BAKE_RESOLUTION = 1024
+
+# Build each planet from a NumPy-generated, noise-displaced mesh instead of a subdivided UV sphere
+USE_GENERATED_MESHES = False
+
+# Build the planets as one instanced point object (see planetSwarm) instead of one object per sphere
+SWARM_MODE = False
+SWARM_SIZE = 100000
+
+# Seed of the planet sizes, offsets and shaders
+PLANET_SEED = 45
+
+
+def create_sphere(location, radius=0.5, config=None, seed=None):
+    if USE_GENERATED_MESHES:
+        return create_planet(location, radius, config, seed=seed)
 
-def create_sphere(location, radius=0.5):
     bpy.ops.mesh.primitive_uv_sphere_add(radius=radius, location=location, segments=32, ring_count=16)
     sphere = bpy.context.active_object
 
@@ -22,68 +43,97 @@ def create_sphere(location, radius=0.5):
     return sphere
 
 
-def animate_spheres_worm(spheres):
-    frames = 250
-    delay_frames = 4
-    amplitude = 2.5
-    frequency = 2.5
+def animate_sphere_worm(sphere, positions, rotations, scales):
+    """Writes one sphere's worm trajectory into its transform F-curves; returns True if any curve changed"""
+    frames = np.arange(len(positions))
+    changed = set_keyframes(sphere, "location", frames, positions)
+    changed |= set_keyframes(sphere, "rotation_euler", frames, rotations)
+    changed |= set_keyframes(sphere, "scale", frames, np.repeat(scales[:, None], 3, axis=1))
+    return changed
 
-    for sphere_idx, sphere in enumerate(spheres):
-        sphere.animation_data_create()
 
-        for frame in range(frames):
-            delayed_frame = frame - (sphere_idx * delay_frames)
-            t = delayed_frame / frames
+def animate_spheres_worm(spheres):
+    positions, rotations, scales = worm_trajectories(len(spheres))
+    for sphere_idx, sphere in enumerate(spheres):
+        animate_sphere_worm(sphere, positions[sphere_idx], rotations[sphere_idx], scales[sphere_idx])
 
-            # Enhanced motion path
-            x = t * 25.0
-            y = math.sin(delayed_frame * 0.1) * amplitude + math.cos(delayed_frame * 0.05) * (amplitude * 0.3)
-            z = 2.0 + math.cos(delayed_frame * 0.1) * amplitude + math.sin(delayed_frame * 0.05) * (amplitude * 0.3)
 
-            sphere.location = (x, y, z)
-            sphere.keyframe_insert(data_path="location", frame=frame)
+def iter_spheres(num_spheres, reconciler=None):
+    """Creates or updates the planet spheres with random sizes and planet shaders, yielding each one"""
+    reconciler = reconciler or SceneReconciler(PLANET_KEY_PREFIX)
+    baked_textures = PlanetShaders.bake_shader_textures(BAKE_RESOLUTION) if BAKE_SHADER_TEXTURES else None
 
-            # More complex rotation
-            sphere.rotation_euler = (
-                math.sin(delayed_frame * 0.15) * math.cos(delayed_frame * 0.12),
-                math.cos(delayed_frame * 0.12) * math.sin(delayed_frame * 0.15),
-                t * math.pi * 2
-            )
-            sphere.keyframe_insert(data_path="rotation_euler", frame=frame)
+    # Only the shader configs are needed here, building the whole collection would orphan its materials
+    configs = ShaderConfigLoader.load_config()
+    shader_types = list(configs.keys())
 
-            # Add scale animation
-            scale = 1 + math.sin(delayed_frame * 0.2) * math.cos(delayed_frame * 0.12)
-            sphere.scale = (scale, scale, scale)
-            sphere.keyframe_insert(data_path="scale", frame=frame)
+    # Seeded so a re-run declares the same planets and only parameter changes touch them
+    rng = random.Random(PLANET_SEED)
 
+    # Create spheres with varying sizes
+    for i in range(num_spheres):
+        radius = 0.25 + rng.random() * 0.15
+        location = (i * -rng.random() * 0.15, 0, 2)
 
-def main():
+        # Assign different planet shaders
+        shader_type = rng.choice(shader_types) if shader_types else None
+        config = configs.get(shader_type)
+        key = f"{PLANET_KEY_PREFIX}{i}"
+        sphere = reconciler.ensure(key, lambda: create_sphere(location=location, radius=radius, config=config,
+                                                              seed=PLANET_SEED * 1000 + i),
+                                   signature=(USE_GENERATED_MESHES, round(radius, 6), shader_type,
+                                              config if USE_GENERATED_MESHES else None))
+
+        # Only rebuild the material when its config or baking changed, keeping compiled shaders warm
+        material_signature = repr((shader_type, config, BAKE_RESOLUTION if BAKE_SHADER_TEXTURES else None))
+        if sphere.get("planet_material") != material_signature or not any(sphere.data.materials):
+            if shader_type:
+                sphere["planet_shader"] = shader_type
+            PlanetShaders.apply_shader(sphere, baked_textures)
+            sphere["planet_material"] = material_signature
+            reconciler.mark_updated(key)
+
+        yield sphere
+
+
+def create_spheres(num_spheres):
+    """Creates or updates the planet spheres with random sizes and planet shaders"""
+    reconciler = SceneReconciler(PLANET_KEY_PREFIX)
+    spheres = list(iter_spheres(num_spheres, reconciler))
+    reconciler.remove_stale()
+    return spheres
+
+
+def build_steps():
+    """Builds the planets in small work units, yielding the stage progress (0 to 1) after each"""
     print("Executing enhanced spheres animations...")
 
     # Register planet shader property
     register()
 
-    bpy.ops.object.select_all(action='SELECT')
-    bpy.ops.object.delete()
+    # The first run clears what no stage owns, later runs update the objects of the previous one in place
+    adopt_scene()
 
-    # Create spheres with varying sizes
-    spheres = []
-    num_spheres = 45
-    for i in range(num_spheres):
-        radius = 0.25 + random.random() * 0.15
-        sphere = create_sphere(location=(i * -random.random() * 0.15, 0, 2), radius=radius)
-
-        # Assign different planet shaders
-        shader_types = list(PlanetShaders.create_shader_collection().keys())
-        if shader_types:
-            sphere["planet_shader"] = random.choice(shader_types)
-
-        # Apply the shader
-        PlanetShaders.apply_shader(sphere)
+    # Planets left by an earlier run are updated in place, only missing ones are created and stale ones removed
+    reconciler = SceneReconciler(PLANET_KEY_PREFIX)
 
-        spheres.append(sphere)
-
-    animate_spheres_worm(spheres)
+    num_spheres = 45
+    spheres = []
+    if SWARM_MODE:
+        # The swarm's prototype materials are built from the shader configs
+        configs = tuple(ShaderConfigLoader.load_config().values())
+        reconciler.ensure(f"{PLANET_KEY_PREFIX}swarm", lambda: create_swarm(SWARM_SIZE),
+                          signature=(SWARM_SIZE, configs))
+    else:
+        for sphere in iter_spheres(num_spheres, reconciler):
+            spheres.append(sphere)
+            yield 0.4 * len(spheres) / num_spheres
+        positions, rotations, scales = worm_trajectories(num_spheres)
+        for sphere_idx, sphere in enumerate(spheres):
+            changed = animate_sphere_worm(sphere, positions[sphere_idx], rotations[sphere_idx], scales[sphere_idx])
+            reconciler.mark_updated(pipeline_key(sphere), changed)
+            yield 0.4 + 0.4 * (sphere_idx + 1) / num_spheres
+    reconciler.remove_stale()
 
     # Enhanced render settings
     bpy.context.scene.render.engine = 'CYCLES'
@@ -98,14 +148,21 @@ def main():
 
     # Debug: Print sphere positions and visibility
     scene = bpy.context.scene
+    frame_count = scene.frame_end - scene.frame_start + 1
     for frame in range(scene.frame_start, scene.frame_end + 1):
         scene.frame_set(frame)
         print(f"Frame {frame}:")
         for sphere in spheres:
             print(f"Sphere {sphere.name}: Location {sphere.location}, Visible {sphere.visible_get()}")
+        yield 0.8 + 0.2 * (frame - scene.frame_start + 1) / frame_count
 
     print("Enhanced spheres animation completed.")
 
 
+def main():
+    for _ in build_steps():
+        pass
+
+
 if __name__ == "__main__":
     main()
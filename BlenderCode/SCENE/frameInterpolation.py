@@ -0,0 +1,329 @@
+import os
+import sys
+
+import bpy
+import numpy as np
+
+try:
+    import OpenImageIO as oiio
+except ImportError:  # Bundled with Blender 4.x, may be missing from older builds
+    oiio = None
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from cameraAnimations import get_shot_ranges
+
+# Cycles stores pre - center in (X, Y), the motion towards the previous frame, and center - post in (Z, W),
+# the motion away from the next frame (primitive_motion_vector in the Cycles kernel)
+VECTOR_CHANNELS = ('Vector.X', 'Vector.Y', 'Vector.Z', 'Vector.W')
+COMBINED_CHANNELS = ('Combined.R', 'Combined.G', 'Combined.B', 'Combined.A')
+DEPTH_CHANNEL = 'Depth.Z'
+
+# Splat offsets of the 2x2 footprint each source pixel covers around its landing point
+SPLAT_FOOTPRINT = ((0, 0), (1, 0), (0, 1), (1, 1))
+
+# Holes up to this many pixels from a covered pixel are filled from their neighbours, larger ones are disocclusions
+HOLE_FILL_RADIUS = 2
+
+
+def save_interpolation_settings(scene):
+    """Returns the (struct, attribute, value) settings setup_interpolation_passes changes"""
+    view_layer = bpy.context.view_layer
+    image_settings = scene.render.image_settings
+    return [(struct, attribute, getattr(struct, attribute)) for struct, attribute in (
+        (view_layer, 'use_pass_vector'), (view_layer, 'use_pass_z'), (view_layer.cycles, 'denoising_store_passes'),
+        (scene.render, 'use_motion_blur'), (image_settings, 'file_format'), (image_settings, 'color_depth'),
+    )]
+
+
+def setup_interpolation_passes(scene):
+    """Enables the passes the interpolator needs and writes them to multilayer EXR"""
+    view_layer = bpy.context.view_layer
+    view_layer.use_pass_vector = True
+    view_layer.use_pass_z = True
+    view_layer.cycles.denoising_store_passes = True
+
+    # Cycles only outputs the vector pass without motion blur
+    scene.render.use_motion_blur = False
+    scene.render.image_settings.file_format = 'OPEN_EXR_MULTILAYER'
+    scene.render.image_settings.color_depth = '32'
+
+
+def get_cut_free_ranges(scene):
+    """Returns (frame_start, frame_end) ranges between camera cuts; markers that keep the camera are not cuts"""
+    ranges = []
+    previous_camera = None
+    for name, camera, frame_start, frame_end in get_shot_ranges(scene):
+        if ranges and camera == previous_camera:
+            ranges[-1] = (ranges[-1][0], frame_end)
+        else:
+            ranges.append((frame_start, frame_end))
+        previous_camera = camera
+    return ranges
+
+
+def plan_key_frames(ranges, step):
+    """Picks every step-th frame of each range plus its last frame, so no interpolation crosses a cut"""
+    key_frames = []
+    for frame_start, frame_end in ranges:
+        keys = list(range(frame_start, frame_end + 1, step))
+        if keys[-1] != frame_end:
+            keys.append(frame_end)
+        key_frames.append(keys)
+    return key_frames
+
+
+def render_frames(scene, frames, output_dir):
+    """Renders the given frames to multilayer EXR files in output_dir"""
+    filepath = scene.render.filepath
+    try:
+        for frame in frames:
+            scene.frame_set(frame)
+            scene.render.filepath = key_frame_path(output_dir, frame)
+            bpy.ops.render.render(write_still=True)
+    finally:
+        scene.render.filepath = filepath
+
+
+def key_frame_path(output_dir, frame):
+    return os.path.join(output_dir, "keys", f"key_{frame:04d}.exr")
+
+
+def output_frame_path(output_dir, frame):
+    return os.path.join(output_dir, f"frame_{frame:04d}.exr")
+
+
+def read_layers(path):
+    """Reads the combined color, depth and motion vectors of a multilayer EXR as (H, W, C) arrays"""
+    image = oiio.ImageInput.open(path)
+    if image is None:
+        raise RuntimeError(f"Could not open {path}: {oiio.geterror()}")
+    try:
+        names = list(image.spec().channelnames)
+        pixels = image.read_image(0, 0, 0, len(names), 'float')
+    finally:
+        image.close()
+
+    def channels(suffixes):
+        indices = []
+        for suffix in suffixes:
+            # Match the whole pass name, "Depth.Z" must not pick up "Denoising Depth.Z"
+            matches = [index for index, name in enumerate(names) if name == suffix or name.endswith("." + suffix)]
+            if not matches:
+                raise RuntimeError(f"{path} has no {suffix} channel, render with setup_interpolation_passes first")
+            indices.append(matches[0])
+        return pixels[:, :, indices]
+
+    vectors = channels(VECTOR_CHANNELS)
+    # Blender measures y upwards, image rows go downwards
+    vectors[:, :, 1] *= -1.0
+    vectors[:, :, 3] *= -1.0
+    return {
+        'color': channels(COMBINED_CHANNELS),
+        'depth': channels((DEPTH_CHANNEL,))[:, :, 0],
+        'previous': vectors[:, :, 0:2],
+        'next': -vectors[:, :, 2:4],
+    }
+
+
+def write_color(path, color):
+    """Writes an RGBA float image"""
+    height, width, channel_count = color.shape
+    output = oiio.ImageOutput.create(path)
+    output.open(path, oiio.ImageSpec(width, height, channel_count, 'half'))
+    output.write_image(np.ascontiguousarray(color, dtype=np.float32))
+    output.close()
+
+
+def forward_warp(color, depth, flow, fraction):
+    """Splats every pixel along fraction * flow, keeping the nearest surface where pixels land together.
+
+    Each pixel covers the 2x2 pixels around its landing point, so flow that spreads out does not open cracks.
+    """
+    height, width = depth.shape
+    rows, columns = np.mgrid[0:height, 0:width]
+    landing_columns = (columns + flow[:, :, 0] * fraction).ravel()
+    landing_rows = (rows + flow[:, :, 1] * fraction).ravel()
+    base_columns = np.floor(landing_columns).astype(np.int64)
+    base_rows = np.floor(landing_rows).astype(np.int64)
+
+    sources, targets, distances = [], [], []
+    for column_offset, row_offset in SPLAT_FOOTPRINT:
+        target_columns = base_columns + column_offset
+        target_rows = base_rows + row_offset
+        inside = np.flatnonzero((target_columns >= 0) & (target_columns < width) &
+                                (target_rows >= 0) & (target_rows < height))
+        sources.append(inside)
+        targets.append(target_rows[inside] * width + target_columns[inside])
+        distances.append(np.abs(target_columns[inside] - landing_columns[inside]) +
+                         np.abs(target_rows[inside] - landing_rows[inside]))
+    sources = np.concatenate(sources)
+    targets = np.concatenate(targets)
+    distances = np.concatenate(distances)
+
+    # Where pixels land together the nearest surface wins, then the splat landing closest to the pixel:
+    # sort by target, depth and distance, and keep the first of each target
+    order = np.lexsort((distances, depth.ravel()[sources], targets))
+    sources = sources[order]
+    targets = targets[order]
+    winners = np.ones(len(targets), dtype=bool)
+    winners[1:] = targets[1:] != targets[:-1]
+    sources = sources[winners]
+    targets = targets[winners]
+
+    warped = np.zeros((height * width, color.shape[2]), dtype=np.float32)
+    covered = np.zeros(height * width, dtype=bool)
+    warped[targets] = color.reshape(-1, color.shape[2])[sources]
+    covered[targets] = True
+    return warped.reshape(color.shape), covered.reshape(height, width)
+
+
+def fill_holes(color, covered, radius=HOLE_FILL_RADIUS):
+    """Grows covered pixels into the holes next to them, one pixel per pass; returns the color and its coverage"""
+    color = color.copy()
+    covered = covered.copy()
+    for _ in range(radius):
+        if covered.all():
+            break
+        weights = covered.astype(np.float32)
+        padded_color = np.pad(color * weights[:, :, None], ((1, 1), (1, 1), (0, 0)))
+        padded_weights = np.pad(weights, 1)
+        total = np.zeros_like(color)
+        count = np.zeros(weights.shape, dtype=np.float32)
+        for row_offset, column_offset in ((0, 1), (2, 1), (1, 0), (1, 2)):
+            total += padded_color[row_offset:row_offset + color.shape[0], column_offset:column_offset + color.shape[1]]
+            count += padded_weights[row_offset:row_offset + color.shape[0], column_offset:column_offset + color.shape[1]]
+        filled = ~covered & (count > 0)
+        color[filled] = total[filled] / count[filled][:, None]
+        covered |= filled
+    return color, covered
+
+
+def synthesize_frame(before, after, offset, distance):
+    """Builds the frame offset frames after `before` from both key frames, returns it and its disoccluded fraction"""
+    weight_after = offset / distance
+    from_before, covered_before = forward_warp(before['color'], before['depth'], before['next'], offset)
+    from_after, covered_after = forward_warp(after['color'], after['depth'], after['previous'], distance - offset)
+
+    weights_before = covered_before * (1.0 - weight_after)
+    weights_after = covered_after * weight_after
+    total = weights_before + weights_after
+    blended = (from_before * weights_before[:, :, None] + from_after * weights_after[:, :, None])
+    blended /= np.maximum(total, 1e-8)[:, :, None]
+
+    # Cracks and thin holes take their neighbours' color; what is left is disocclusion
+    blended, covered = fill_holes(blended, covered_before | covered_after)
+    holes = ~covered
+
+    # Frames under the quality gate still must not ship empty pixels, the nearer key stands in for them
+    nearest = before if offset * 2 <= distance else after
+    blended[holes] = nearest['color'][holes]
+    return blended, float(holes.mean())
+
+
+def measure_vector_signs(before, after, distance):
+    """Checks on a rendered key pair which sign of each motion field moves one key onto the other.
+
+    Returns {'next': sign, 'previous': sign}, 1.0 where the field matches the convention read_layers assumes.
+    """
+    signs = {}
+    for source, target, field in ((before, after, 'next'), (after, before, 'previous')):
+        errors = {}
+        for sign in (1.0, -1.0):
+            warped, covered = forward_warp(source['color'], source['depth'], source[field] * sign, distance)
+            errors[sign] = float(np.abs(warped - target['color'])[covered].mean()) if covered.any() else np.inf
+        # A still pair matches both ways, which keeps the documented convention
+        signs[field] = 1.0 if errors[1.0] <= errors[-1.0] else -1.0
+    return signs
+
+
+def check_vector_convention(key_frames, output_dir):
+    """Measures the vector pass signs on the first rendered key pair and warns when they differ from the assumed"""
+    for keys in key_frames:
+        if len(keys) > 1:
+            signs = measure_vector_signs(read_layers(key_frame_path(output_dir, keys[0])),
+                                         read_layers(key_frame_path(output_dir, keys[1])), keys[1] - keys[0])
+            break
+    else:
+        return {'next': 1.0, 'previous': 1.0}
+
+    for field, sign in signs.items():
+        if sign < 0:
+            print(f"Warning: the {field} motion vectors of keys {keys[0]}-{keys[1]} point the opposite way "
+                  f"from the Cycles convention, flipping them")
+    return signs
+
+
+def read_key(output_dir, frame, signs):
+    layers = read_layers(key_frame_path(output_dir, frame))
+    for field, sign in signs.items():
+        layers[field] *= sign
+    return layers
+
+
+def interpolate_range(keys, output_dir, hole_threshold, signs):
+    """Fills the frames between consecutive keys, returns the frames that failed the quality gate"""
+    fallback = []
+    after = None
+    for before_frame, after_frame in zip(keys, keys[1:]):
+        before = after if after is not None else read_key(output_dir, before_frame, signs)
+        after = read_key(output_dir, after_frame, signs)
+        write_color(output_frame_path(output_dir, before_frame), before['color'])
+
+        distance = after_frame - before_frame
+        for offset in range(1, distance):
+            frame, holes = synthesize_frame(before, after, offset, distance)
+            if holes > hole_threshold:
+                fallback.append(before_frame + offset)
+            else:
+                write_color(output_frame_path(output_dir, before_frame + offset), frame)
+
+    last = after if after is not None else read_layers(key_frame_path(output_dir, keys[-1]))
+    write_color(output_frame_path(output_dir, keys[-1]), last['color'])
+    return fallback
+
+
+def render_interpolated(scene=None, output_dir=None, step=2, hole_threshold=0.005):
+    """Renders every step-th frame, interpolates the rest and re-renders frames with too much disocclusion"""
+    if oiio is None:
+        raise RuntimeError("Frame interpolation needs the OpenImageIO module bundled with Blender 4.x")
+    scene = scene or bpy.context.scene
+    output_dir = output_dir or bpy.path.abspath("//interpolated")
+    os.makedirs(os.path.join(output_dir, "keys"), exist_ok=True)
+    saved = save_interpolation_settings(scene)
+    current_frame = scene.frame_current
+
+    try:
+        setup_interpolation_passes(scene)
+        key_frames = plan_key_frames(get_cut_free_ranges(scene), step)
+        render_frames(scene, [frame for keys in key_frames for frame in keys], output_dir)
+
+        signs = check_vector_convention(key_frames, output_dir)
+        fallback = []
+        for keys in key_frames:
+            fallback.extend(interpolate_range(keys, output_dir, hole_threshold, signs))
+
+        # Frames that failed the gate get a real render
+        render_frames(scene, fallback, output_dir)
+    finally:
+        for struct, attribute, value in saved:
+            setattr(struct, attribute, value)
+        scene.frame_set(current_frame)
+    for frame in fallback:
+        write_color(output_frame_path(output_dir, frame), read_layers(key_frame_path(output_dir, frame))['color'])
+
+    total = scene.frame_end - scene.frame_start + 1
+    rendered = sum(len(keys) for keys in key_frames) + len(fallback)
+    print(f"Interpolated {total - rendered} of {total} frames, rendered {rendered} "
+          f"({len(fallback)} fell back on disocclusion), {rendered / total:.0%} of the full render cost")
+    return {'rendered': rendered, 'interpolated': total - rendered, 'fallback': fallback}
+
+
+def main():
+    print("Rendering with frame interpolation...")
+    render_interpolated()
+    print("Frame interpolation completed.")
+
+
+if __name__ == "__main__":
+    main()
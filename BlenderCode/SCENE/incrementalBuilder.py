@@ -0,0 +1,214 @@
+import time
+import tracemalloc
+
+import bpy
+
+# Seconds of work per timer tick, and the pause left for the UI between ticks
+TICK_BUDGET = 0.05
+TICK_INTERVAL = 0.01
+
+# The build driven by the timer is kept in a namespace that survives script reloads,
+# so a re-run or the cancel operator always finds it
+ACTIVE_BUILD_KEY = "incremental_planet_build"
+
+
+def get_active_build():
+    return bpy.app.driver_namespace.get(ACTIVE_BUILD_KEY)
+
+
+def set_active_build(build):
+    bpy.app.driver_namespace[ACTIVE_BUILD_KEY] = build
+
+
+def single_step(function):
+    """Wraps a plain stage function as a one-unit generator"""
+    def steps():
+        function()
+        yield 1.0
+    return steps
+
+
+def stage_steps(module):
+    """Returns a module's build_steps generator, or its main() as a single work unit"""
+    if hasattr(module, 'build_steps'):
+        return module.build_steps
+    return single_step(module.main)
+
+
+class IncrementalBuilder:
+    """Runs build stages as generators of work units, a time budget per timer tick"""
+
+    def __init__(self, stages, budget=TICK_BUDGET, on_finished=None, trace_memory=False):
+        self.stages = list(stages)
+        self.budget = budget
+        self.on_finished = on_finished
+        self.trace_memory = trace_memory
+        self.tracing = False
+        self.stage_index = 0
+        self.stage_progress = 0.0
+        self.steps = None
+        self.stage_peaks = {}
+        self.cancelled = False
+        self.finished = False
+
+    @property
+    def stage_name(self):
+        return self.stages[self.stage_index][0] if self.stage_index < len(self.stages) else None
+
+    @property
+    def progress(self):
+        return (self.stage_index + self.stage_progress) / max(len(self.stages), 1)
+
+    def advance(self):
+        """Runs one work unit; returns False once every stage is done"""
+        if self.stage_index >= len(self.stages):
+            return False
+
+        name, steps = self.stages[self.stage_index]
+        if self.steps is None:
+            print(f"Building {name}")
+            self.steps = steps()
+            self.stage_progress = 0.0
+            if tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+
+        try:
+            progress = next(self.steps)
+            if isinstance(progress, (int, float)):
+                self.stage_progress = min(max(float(progress), 0.0), 1.0)
+        except StopIteration:
+            self.next_stage()
+        except Exception as e:
+            print(f"Error executing {name}: {str(e)}")
+            self.next_stage()
+        return self.stage_index < len(self.stages)
+
+    def next_stage(self):
+        if tracemalloc.is_tracing():
+            self.stage_peaks[self.stage_name] = tracemalloc.get_traced_memory()[1]
+        self.steps = None
+        self.stage_index += 1
+        self.stage_progress = 0.0
+
+    def run_to_completion(self):
+        """Runs every stage in a tight loop, as used in --background mode"""
+        while self.advance():
+            pass
+        self.finish()
+
+    def tick(self):
+        """Timer callback: works for one budget, then hands control back to the UI"""
+        if self.cancelled:
+            return None
+
+        # Timers run without a window in context, which operators used by the stages rely on
+        window = bpy.context.window_manager.windows[0]
+        deadline = time.perf_counter() + self.budget
+        running = True
+        with bpy.context.temp_override(window=window, screen=window.screen):
+            while running and time.perf_counter() < deadline:
+                running = self.advance()
+
+        if not running:
+            self.finish()
+            return None
+
+        self.show_progress()
+        return TICK_INTERVAL
+
+    def show_progress(self):
+        text = (f"Building {self.stage_name} ({self.stage_index + 1}/{len(self.stages)}): "
+                f"{self.progress:.0%} - run 'Cancel Planet Build' to stop")
+        window_manager = bpy.context.window_manager
+        for window in window_manager.windows:
+            window.workspace.status_text_set(text)
+        window_manager.progress_update(int(self.progress * 100))
+
+    def clear_progress(self):
+        if bpy.app.background:
+            return
+        window_manager = bpy.context.window_manager
+        for window in window_manager.windows:
+            window.workspace.status_text_set(None)
+        window_manager.progress_end()
+
+    def start(self):
+        """Runs the build on timers in the UI, or straight through in background mode"""
+        # A build still running would stop the tracing started below when it is cancelled
+        if get_active_build() is not None:
+            get_active_build().cancel()
+
+        # Tracks the Python allocation peak of every stage; finish() and cancel() stop the tracing again
+        if self.trace_memory:
+            if tracemalloc.is_tracing():
+                print("Warning: tracemalloc was started outside the build, it keeps tracing after the build ends")
+            else:
+                tracemalloc.start()
+                self.tracing = True
+
+        if bpy.app.background:
+            self.run_to_completion()
+            return
+
+        set_active_build(self)
+        bpy.context.window_manager.progress_begin(0, 100)
+        bpy.app.timers.register(self.tick, first_interval=TICK_INTERVAL)
+
+    def cancel(self):
+        """Stops the build after the current work unit, keeping what was already built"""
+        if self.finished or self.cancelled:
+            return
+        self.cancelled = True
+        if self.steps is not None:
+            self.steps.close()
+        if bpy.app.timers.is_registered(self.tick):
+            bpy.app.timers.unregister(self.tick)
+        self.clear_progress()
+        if get_active_build() is self:
+            set_active_build(None)
+        print(f"Build cancelled during {self.stage_name}")
+        self.stop_tracing()
+        if self.on_finished:
+            self.on_finished(self)
+
+    def finish(self):
+        if self.finished:
+            return
+        self.finished = True
+        self.clear_progress()
+        if get_active_build() is self:
+            set_active_build(None)
+        self.stop_tracing()
+        if self.on_finished:
+            self.on_finished(self)
+
+    def stop_tracing(self):
+        if self.tracing:
+            tracemalloc.stop()
+            self.tracing = False
+
+
+class SCENE_OT_cancel_planet_build(bpy.types.Operator):
+    """Cancel the running incremental planet scene build"""
+    bl_idname = "scene.cancel_planet_build"
+    bl_label = "Cancel Planet Build"
+
+    def execute(self, context):
+        build = get_active_build()
+        if build is None:
+            self.report({'INFO'}, "No planet build is running")
+            return {'CANCELLED'}
+        build.cancel()
+        return {'FINISHED'}
+
+
+def register():
+    # Replace a class registered by an earlier run of the script
+    unregister()
+    bpy.utils.register_class(SCENE_OT_cancel_planet_build)
+
+
+def unregister():
+    registered = getattr(bpy.types, SCENE_OT_cancel_planet_build.__name__, None)
+    if registered is not None:
+        bpy.utils.unregister_class(registered)
@@ -0,0 +1,241 @@
+import hashlib
+import os
+import shutil
+
+import bpy
+import numpy as np
+
+# Properties that never change the rendered image
+IGNORED_PROPERTIES = {
+    'rna_type', 'name', 'name_full', 'filepath', 'frame_current', 'frame_current_final', 'frame_float',
+    'is_evaluated', 'original', 'session_uid', 'users', 'use_fake_user', 'tag', 'is_runtime_data',
+}
+
+# Node editor layout and display properties; on lights and worlds the same names, like color, do render
+NODE_IGNORED_PROPERTIES = IGNORED_PROPERTIES | {
+    'label', 'location', 'width', 'height', 'width_hidden', 'dimensions', 'select', 'show_options',
+    'show_preview', 'show_texture', 'hide', 'mute_ui', 'use_custom_color', 'color', 'bl_idname', 'bl_label',
+    'bl_description', 'bl_icon', 'bl_static_type', 'bl_width_default', 'bl_width_min', 'bl_width_max',
+    'bl_height_default', 'bl_height_min', 'bl_height_max', 'internal_links', 'parent',
+}
+
+# Custom property flagging objects whose data a frame change handler rewrites outside of any animation
+DYNAMIC_DATA_KEY = "dynamic_data"
+
+# Per-point attribute values hashed for meshes rewritten every frame: (foreach key, values per element, dtype)
+ATTRIBUTE_VALUE_KEYS = {
+    'FLOAT': ('value', 1, np.float32),
+    'INT': ('value', 1, np.int32),
+    'FLOAT_VECTOR': ('vector', 3, np.float32),
+}
+
+
+def is_animated(id_data):
+    return id_data is not None and id_data.animation_data is not None and id_data.animation_data.action is not None
+
+
+def mesh_is_dynamic(obj):
+    """Returns True if a mesh object's geometry can change from frame to frame"""
+    mesh = obj.data
+    if any(modifier.type == 'NODES' for modifier in obj.modifiers):
+        return True
+    if is_animated(mesh) or is_animated(mesh.shape_keys):
+        return True
+    return bool(obj.get(DYNAMIC_DATA_KEY))
+
+
+def rna_values(struct, ignored=IGNORED_PROPERTIES):
+    """Returns the plain (non-pointer, writable) RNA property values of a struct as a hashable tuple"""
+    values = []
+    for prop in struct.bl_rna.properties:
+        if prop.identifier in ignored or prop.is_readonly:
+            continue
+        if prop.type in {'POINTER', 'COLLECTION'}:
+            continue
+        value = getattr(struct, prop.identifier, None)
+        if hasattr(value, '__len__') and not isinstance(value, str):
+            value = tuple(value) if not hasattr(value, 'to_tuple') else value.to_tuple()
+        values.append((prop.identifier, value))
+    return tuple(values)
+
+
+def socket_value(socket):
+    """Returns the default value of an unlinked input socket in a hashable form"""
+    value = getattr(socket, 'default_value', None)
+    if hasattr(value, 'name_full'):
+        return value.name_full
+    if hasattr(value, '__len__') and not isinstance(value, str):
+        return tuple(value)
+    return value
+
+
+class FrameHasher:
+    """Hashes everything that affects a rendered frame, memoizing datablocks that do not animate"""
+
+    def __init__(self):
+        self.node_tree_hashes = {}
+        self.mesh_hashes = {}
+
+    def hash_node_tree(self, node_tree):
+        if node_tree is None:
+            return None
+        # Animated node trees have to be rehashed every frame
+        animated = node_tree.animation_data is not None and node_tree.animation_data.action is not None
+        # Embedded trees of materials and worlds share names, the original datablock is what identifies them
+        key = node_tree.original.as_pointer()
+        if not animated and key in self.node_tree_hashes:
+            return self.node_tree_hashes[key]
+
+        digest = hashlib.sha256()
+        for node in sorted(node_tree.nodes, key=lambda n: n.name):
+            digest.update(repr((node.name, node.bl_idname, node.mute, rna_values(node, NODE_IGNORED_PROPERTIES))).encode())
+            for socket in node.inputs:
+                if not socket.is_linked:
+                    digest.update(repr((socket.identifier, socket_value(socket))).encode())
+            if getattr(node, 'color_ramp', None):
+                ramp = node.color_ramp
+                digest.update(repr((ramp.interpolation, ramp.color_mode, [
+                    (element.position, tuple(element.color)) for element in ramp.elements
+                ])).encode())
+            if getattr(node, 'image', None):
+                image = node.image
+                digest.update(repr((image.name_full, bpy.path.abspath(image.filepath), image.size[:])).encode())
+            if getattr(node, 'node_tree', None):
+                digest.update(repr(self.hash_node_tree(node.node_tree)).encode())
+        for link in node_tree.links:
+            digest.update(repr((link.from_node.name, link.from_socket.identifier,
+                                link.to_node.name, link.to_socket.identifier, link.is_muted)).encode())
+
+        result = digest.hexdigest()
+        if not animated:
+            self.node_tree_hashes[key] = result
+        return result
+
+    def hash_mesh(self, obj):
+        """Hashes an evaluated mesh object; static meshes are hashed once per run from their original data"""
+        original = obj.original
+        dynamic = mesh_is_dynamic(original)
+        key = (original.name_full, original.data.name_full)
+        if not dynamic and key in self.mesh_hashes:
+            return self.mesh_hashes[key]
+
+        # Meshes rewritten per frame are hashed as evaluated, which includes their modifiers' output
+        mesh = obj.data if dynamic else original.data
+        digest = hashlib.sha256()
+        coordinates = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+        mesh.vertices.foreach_get("co", coordinates)
+        digest.update(coordinates.tobytes())
+        for attribute in mesh.attributes if dynamic else ():
+            if attribute.domain == 'POINT' and attribute.data_type in ATTRIBUTE_VALUE_KEYS:
+                value_key, width, dtype = ATTRIBUTE_VALUE_KEYS[attribute.data_type]
+                values = np.empty(len(attribute.data) * width, dtype=dtype)
+                attribute.data.foreach_get(value_key, values)
+                digest.update(attribute.name.encode() + values.tobytes())
+        digest.update(repr([(modifier.type, modifier.show_render, rna_values(modifier))
+                            for modifier in original.modifiers]).encode())
+
+        result = digest.hexdigest()
+        if not dynamic:
+            self.mesh_hashes[key] = result
+        return result
+
+    def hash_object(self, obj, matrix, is_instance=False):
+        parts = [obj.type, is_instance, tuple(round(value, 6) for row in matrix for value in row)]
+        if obj.type == 'MESH':
+            parts.append(self.hash_mesh(obj))
+        elif obj.type == 'LIGHT':
+            parts.append(rna_values(obj.data))
+            parts.append(self.hash_node_tree(obj.data.node_tree) if obj.data.use_nodes else None)
+        elif obj.data is not None and hasattr(obj.data, 'bl_rna'):
+            parts.append(rna_values(obj.data))
+        for slot in obj.material_slots:
+            material = slot.material
+            if material is not None:
+                parts.append((material.name_full, rna_values(material),
+                              self.hash_node_tree(material.node_tree) if material.use_nodes else None))
+        return repr(parts)
+
+    def hash_frame(self, scene, depsgraph):
+        digest = hashlib.sha256()
+        digest.update(repr((rna_values(scene.render), rna_values(scene.cycles),
+                            rna_values(scene.render.image_settings), rna_values(scene.view_settings),
+                            rna_values(scene.display_settings))).encode())
+
+        # Color management curves and the compositor change the written image as well
+        view_settings = scene.view_settings
+        if view_settings.use_curve_mapping:
+            digest.update(repr([[tuple(point.location) for point in curve.points]
+                                for curve in view_settings.curve_mapping.curves]).encode())
+        if scene.use_nodes and scene.node_tree is not None:
+            digest.update(repr(self.hash_node_tree(scene.node_tree)).encode())
+        for view_layer in scene.view_layers:
+            digest.update(repr((view_layer.name, view_layer.use, rna_values(view_layer))).encode())
+
+        world = scene.world
+        if world is not None:
+            digest.update(repr((rna_values(world),
+                                self.hash_node_tree(world.node_tree) if world.use_nodes else None)).encode())
+
+        camera = scene.camera
+        if camera is not None:
+            evaluated_camera = camera.evaluated_get(depsgraph)
+            digest.update(repr((tuple(tuple(row) for row in evaluated_camera.matrix_world),
+                                rna_values(evaluated_camera.data))).encode())
+
+        # Instances cover geometry-node swarms and particles as well as plain objects. The depsgraph only
+        # yields what renders, and instanced prototypes live in collections outside the view layer
+        instances = []
+        for instance in depsgraph.object_instances:
+            obj = instance.object
+            if obj.type == 'CAMERA':
+                continue
+            instances.append(self.hash_object(obj, instance.matrix_world, instance.is_instance))
+        for entry in sorted(instances):
+            digest.update(entry.encode())
+
+        return digest.hexdigest()
+
+
+def render_incremental(scene=None, output_dir=None, cache_dir=None):
+    """Renders only the frames whose content hash is not in the cache and copies the rest from it"""
+    scene = scene or bpy.context.scene
+    output_dir = output_dir or bpy.path.abspath("//render")
+    cache_dir = cache_dir or bpy.path.abspath("//render_cache")
+    os.makedirs(output_dir, exist_ok=True)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    extension = scene.render.file_extension
+    hasher = FrameHasher()
+    filepath = scene.render.filepath
+    current_frame = scene.frame_current
+    rendered = []
+
+    try:
+        for frame in range(scene.frame_start, scene.frame_end + 1):
+            scene.frame_set(frame)
+            frame_hash = hasher.hash_frame(scene, bpy.context.evaluated_depsgraph_get())
+            cached_path = os.path.join(cache_dir, frame_hash + extension)
+
+            if not os.path.exists(cached_path):
+                scene.render.filepath = cached_path
+                bpy.ops.render.render(write_still=True)
+                rendered.append(frame)
+
+            shutil.copyfile(cached_path, os.path.join(output_dir, f"frame_{frame:04d}{extension}"))
+    finally:
+        scene.render.filepath = filepath
+        scene.frame_set(current_frame)
+
+    total = scene.frame_end - scene.frame_start + 1
+    print(f"Incremental render: {len(rendered)} of {total} frames rendered, {total - len(rendered)} from cache")
+    return rendered
+
+
+def main():
+    print("Rendering changed frames...")
+    render_incremental()
+    print("Incremental render completed.")
+
+
+if __name__ == "__main__":
+    main()
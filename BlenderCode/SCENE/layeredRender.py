@@ -0,0 +1,520 @@
+import math
+import os
+import sys
+
+import bpy
+import numpy as np
+from mathutils import Matrix
+
+try:
+    import OpenImageIO as oiio
+except ImportError:  # Bundled with Blender 4.x, may be missing from older builds
+    oiio = None
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from renderCostEstimator import has_volume_output
+
+COMPOSITE_SCENE_NAME = "LayeredComposite"
+PANORAMA_SCENE_NAME = "LayeredPanorama"
+
+# Collections made by organizeHierarchie; cameras stay in every layer so each one can render
+PLANET_COLLECTIONS = ("Planets",)
+LIGHT_COLLECTIONS = ("Lighting", "External Lights")
+BACKGROUND_COLLECTIONS = ("SpaceEnvironnement",)
+CAMERA_COLLECTIONS = ("Camera",)
+
+BACKGROUND_LAYER = "Background"
+
+# Layers from bottom to top of the composite, each with its collections, render filters and quality budget.
+# Holdout collections cut their shape out of a layer without rendering them. The bottom layer renders an opaque
+# film so the world sky stays in it; volume layers are skipped when nothing they include has a volume.
+LAYERS = {
+    "Background": {
+        'include': BACKGROUND_COLLECTIONS,
+        'holdout': (),
+        'filters': {'use_sky': True, 'use_volumes': False},
+        'samples': 16,
+        'resolution_scale': 1.0,
+        'denoise': False,
+        'transparent': False,
+        'volumes_only': False,
+    },
+    "Atmosphere": {
+        'include': LIGHT_COLLECTIONS,
+        'holdout': PLANET_COLLECTIONS,
+        'filters': {'use_sky': False, 'use_volumes': True},
+        'samples': 64,
+        'resolution_scale': 0.5,
+        'denoise': True,
+        'transparent': True,
+        'volumes_only': True,
+    },
+    "Planets": {
+        'include': PLANET_COLLECTIONS + LIGHT_COLLECTIONS,
+        'holdout': (),
+        'filters': {'use_sky': False, 'use_volumes': False},
+        'samples': 256,
+        'resolution_scale': 1.0,
+        'denoise': True,
+        'transparent': True,
+        'volumes_only': False,
+    },
+}
+
+# Widest equirectangular background panorama, in pixels; a float RGBA panorama this wide holds 1 GB.
+# Shots that need a sharper panorama render their background every frame instead
+PANORAMA_MAX_WIDTH = 8192
+
+# Orients the panorama camera so its equirectangular image maps world directions like an environment texture:
+# u = (pi - atan2(y, x)) / 2pi, measured from the left, and v = acos(z) / pi, measured from the top
+PANORAMA_ROTATION = Matrix(((0, 0, -1), (-1, 0, 0), (0, 1, 0)))
+
+
+def setup_view_layers(scene):
+    """Creates or updates one view layer per entry of LAYERS"""
+    for name, layer in LAYERS.items():
+        view_layer = scene.view_layers.get(name) or scene.view_layers.new(name)
+        # Only render_layered renders these layers, a plain render keeps its single pass
+        view_layer.use = False
+        for layer_collection in view_layer.layer_collection.children:
+            collection_name = layer_collection.name
+            layer_collection.exclude = collection_name not in layer['include'] + layer['holdout'] + CAMERA_COLLECTIONS
+            layer_collection.holdout = collection_name in layer['holdout']
+        for filter_name, value in layer['filters'].items():
+            setattr(view_layer, filter_name, value)
+        view_layer.samples = layer['samples']
+        view_layer.cycles.use_denoising = layer['denoise']
+
+
+def layer_node_name(name):
+    return f"{name} Layer"
+
+
+def layer_has_content(scene, name):
+    """Returns False for a volume layer when neither the world nor its collections' materials output a volume"""
+    if not LAYERS[name]['volumes_only']:
+        return True
+    if scene.world is not None and scene.world.use_nodes and has_volume_output(scene.world.node_tree, 'OUTPUT_WORLD'):
+        return True
+    for obj in collection_objects(LAYERS[name]['include']):
+        for slot in obj.material_slots:
+            material = slot.material
+            if material is not None and material.use_nodes and has_volume_output(material.node_tree,
+                                                                                 'OUTPUT_MATERIAL'):
+                return True
+    return False
+
+
+def copy_color_management(source, target):
+    """Copies the view transform, look, exposure, curves and display device from one scene to another"""
+    target.display_settings.display_device = source.display_settings.display_device
+    for attribute in ('view_transform', 'look', 'exposure', 'gamma', 'use_curve_mapping'):
+        setattr(target.view_settings, attribute, getattr(source.view_settings, attribute))
+
+    source_mapping = source.view_settings.curve_mapping
+    target_mapping = target.view_settings.curve_mapping
+    for source_curve, target_curve in zip(source_mapping.curves, target_mapping.curves):
+        points = target_curve.points
+        # Curves keep at least two points, extra ones are added or removed to match the source
+        while len(points) > len(source_curve.points):
+            points.remove(points[-1])
+        while len(points) < len(source_curve.points):
+            points.new(0.0, 0.0)
+        for source_point, target_point in zip(source_curve.points, points):
+            target_point.location = source_point.location
+            target_point.handle_type = source_point.handle_type
+    target_mapping.black_level = source_mapping.black_level
+    target_mapping.white_level = source_mapping.white_level
+    target_mapping.update()
+
+
+def setup_composite_scene(scene, names):
+    """Builds the scene whose compositor stacks the named layer renders; it has no geometry of its own to render"""
+    composite = bpy.data.scenes.get(COMPOSITE_SCENE_NAME) or bpy.data.scenes.new(COMPOSITE_SCENE_NAME)
+    composite.render.engine = 'BLENDER_WORKBENCH'
+    composite.render.resolution_x = scene.render.resolution_x
+    composite.render.resolution_y = scene.render.resolution_y
+    composite.render.resolution_percentage = scene.render.resolution_percentage
+    composite.render.use_compositing = True
+    composite.render.image_settings.file_format = 'PNG'
+    composite.render.image_settings.color_mode = 'RGB'
+    # The layers are scene-linear EXRs, the written PNG has to go through the same view as a plain render
+    copy_color_management(scene, composite)
+
+    composite.use_nodes = True
+    nodes = composite.node_tree.nodes
+    links = composite.node_tree.links
+    nodes.clear()
+
+    # Every layer is scaled back to the full render size, then laid over the layers below it
+    result = None
+    for index, name in enumerate(names):
+        image = nodes.new('CompositorNodeImage')
+        image.name = layer_node_name(name)
+        image.label = image.name
+        image.location = (0, -300 * index)
+
+        scale = nodes.new('CompositorNodeScale')
+        scale.space = 'RENDER_SIZE'
+        scale.frame_method = 'STRETCH'
+        scale.location = (250, -300 * index)
+        links.new(image.outputs['Image'], scale.inputs['Image'])
+
+        if result is None:
+            result = scale.outputs['Image']
+        else:
+            alpha_over = nodes.new('CompositorNodeAlphaOver')
+            alpha_over.location = (500, -300 * index)
+            links.new(result, alpha_over.inputs[1])
+            links.new(scale.outputs['Image'], alpha_over.inputs[2])
+            result = alpha_over.outputs['Image']
+
+    output = nodes.new('CompositorNodeComposite')
+    output.location = (750, 0)
+    links.new(result, output.inputs['Image'])
+    return composite
+
+
+def collection_objects(collection_names):
+    objects = []
+    for name in collection_names:
+        collection = bpy.data.collections.get(name)
+        if collection is not None:
+            objects.extend(collection.all_objects)
+    return objects
+
+
+def is_animated(id_data):
+    return id_data is not None and id_data.animation_data is not None and id_data.animation_data.action is not None
+
+
+def background_is_animated(scene):
+    """Returns True if anything the background layer renders moves or changes over time"""
+    world = scene.world
+    if world is not None and (is_animated(world) or (world.node_tree and is_animated(world.node_tree))):
+        return True
+    for obj in collection_objects(BACKGROUND_COLLECTIONS):
+        if is_animated(obj) or is_animated(obj.data):
+            return True
+        if any(slot.material and slot.material.node_tree and is_animated(slot.material.node_tree)
+               for slot in obj.material_slots):
+            return True
+    return False
+
+
+def camera_view(scene):
+    """Snapshots what the scene camera sees at the current frame"""
+    camera = scene.camera
+    data = camera.data
+    return {
+        'matrix': np.array(camera.matrix_world),
+        'type': data.type,
+        'lens': data.lens,
+        'sensor_width': data.sensor_width,
+        'sensor_height': data.sensor_height,
+        'sensor_fit': data.sensor_fit,
+        'shift_x': data.shift_x,
+        'shift_y': data.shift_y,
+    }
+
+
+def background_shell(views):
+    """Returns (center, radius) of the innermost background sphere around every camera position.
+
+    Star shells are opaque emission surfaces, so the innermost one hides everything behind it; without any
+    shell the world is at infinity and radius is infinite. Returns None when a camera leaves the shells.
+    """
+    positions = np.array([view['matrix'][:3, 3] for view in views])
+    shells = []
+    for obj in collection_objects(BACKGROUND_COLLECTIONS):
+        if obj.type != 'MESH':
+            continue
+        center = np.array(obj.matrix_world.translation)
+        radius = max(obj.dimensions) / 2
+        shells.append((radius, center))
+        if np.linalg.norm(positions - center, axis=1).max() >= radius:
+            return None
+    if not shells:
+        return np.zeros(3), math.inf
+    radius, center = min(shells, key=lambda shell: shell[0])
+    return center, radius
+
+
+def camera_rays(view, width, height):
+    """Returns the camera position and the (H, W, 3) world directions of every pixel's ray"""
+    size = max(width, height)
+    if view['sensor_fit'] == 'VERTICAL':
+        focal = view['lens'] / view['sensor_height'] * height
+    elif view['sensor_fit'] == 'HORIZONTAL':
+        focal = view['lens'] / view['sensor_width'] * width
+    else:
+        focal = view['lens'] / view['sensor_width'] * size
+
+    columns = (np.arange(width) + 0.5 - width / 2 + view['shift_x'] * size) / focal
+    rows = (height / 2 - np.arange(height) - 0.5 + view['shift_y'] * size) / focal
+    local = np.empty((height, width, 3))
+    local[:, :, 0] = columns[None, :]
+    local[:, :, 1] = rows[:, None]
+    local[:, :, 2] = -1.0
+
+    # Cameras look down their local -Z axis; the matrix may carry scale, the rotation may not
+    rotation = view['matrix'][:3, :3] / np.linalg.norm(view['matrix'][:3, :3], axis=0)
+    directions = local @ rotation.T
+    directions /= np.linalg.norm(directions, axis=2)[:, :, None]
+    return view['matrix'][:3, 3], directions
+
+
+def panorama_width(views, shell, width, height):
+    """Panorama width that keeps the background as sharp as a direct render from the closest camera position"""
+    center, radius = shell
+    density = 0.0
+    for view in views:
+        focal = view['lens'] / view['sensor_width'] * max(width, height)
+        # Seen from the center, the shell looks smaller than from a camera closer to it
+        closeness = 1.0 if math.isinf(radius) else radius / (radius - np.linalg.norm(view['matrix'][:3, 3] - center))
+        density = max(density, focal * closeness)
+    return 2 * math.ceil(math.pi * density)
+
+
+def render_panorama(scene, center, width, path):
+    """Renders the background collections and world once, as an equirectangular panorama from the shell center"""
+    panorama = bpy.data.scenes.new(PANORAMA_SCENE_NAME)
+    camera_data = bpy.data.cameras.new(PANORAMA_SCENE_NAME)
+    camera = bpy.data.objects.new(PANORAMA_SCENE_NAME, camera_data)
+    try:
+        camera_data.type = 'PANO'
+        camera_data.panorama_type = 'EQUIRECTANGULAR'
+        camera.matrix_world = Matrix.Translation(center) @ PANORAMA_ROTATION.to_4x4()
+        panorama.collection.objects.link(camera)
+        for name in BACKGROUND_COLLECTIONS:
+            collection = bpy.data.collections.get(name)
+            if collection is not None:
+                panorama.collection.children.link(collection)
+
+        # A scene of its own keeps timeline markers from switching back to the shot cameras
+        panorama.camera = camera
+        panorama.world = scene.world
+        panorama.render.film_transparent = LAYERS[BACKGROUND_LAYER]['transparent']
+        panorama.render.engine = 'CYCLES'
+        panorama.render.resolution_x = width
+        panorama.render.resolution_y = width // 2
+        panorama.render.resolution_percentage = 100
+        panorama.cycles.samples = LAYERS[BACKGROUND_LAYER]['samples']
+        panorama.cycles.use_denoising = LAYERS[BACKGROUND_LAYER]['denoise']
+        panorama.render.image_settings.file_format = 'OPEN_EXR'
+        panorama.render.image_settings.color_mode = 'RGBA'
+        panorama.render.image_settings.color_depth = '16'
+        panorama.render.filepath = path
+        bpy.ops.render.render(write_still=True, scene=panorama.name)
+    finally:
+        bpy.data.scenes.remove(panorama)
+        bpy.data.objects.remove(camera)
+        bpy.data.cameras.remove(camera_data)
+
+
+def read_image(path):
+    """Reads an image as a (H, W, C) float array"""
+    image = oiio.ImageInput.open(path)
+    if image is None:
+        raise RuntimeError(f"Could not open {path}: {oiio.geterror()}")
+    try:
+        spec = image.spec()
+        return image.read_image(0, 0, 0, spec.nchannels, 'float')
+    finally:
+        image.close()
+
+
+def write_image(path, pixels):
+    """Writes a (H, W, C) float array as a half float EXR"""
+    height, width, channel_count = pixels.shape
+    output = oiio.ImageOutput.create(path)
+    output.open(path, oiio.ImageSpec(width, height, channel_count, 'half'))
+    output.write_image(np.ascontiguousarray(pixels, dtype=np.float32))
+    output.close()
+
+
+def reproject_background(panorama, view, shell, width, height):
+    """Rebuilds a camera's background from the panorama, following every pixel's ray to the background shell"""
+    center, radius = shell
+    origin, directions = camera_rays(view, width, height)
+    if math.isinf(radius):
+        hits = directions
+    else:
+        # The camera is inside the shell, so the far root of |o + t d| = r is the visible point
+        offset = origin - center
+        b = directions @ offset
+        t = -b + np.sqrt(np.maximum(b * b - (offset @ offset - radius * radius), 0.0))
+        hits = (offset + directions * t[:, :, None]) / radius
+
+    pano_height, pano_width = panorama.shape[:2]
+    x = (math.pi - np.arctan2(hits[:, :, 1], hits[:, :, 0])) / (2 * math.pi) * pano_width - 0.5
+    y = np.arccos(np.clip(hits[:, :, 2], -1.0, 1.0)) / math.pi * pano_height - 0.5
+
+    # Bilinear lookup, wrapping around in longitude
+    x0 = np.floor(x).astype(np.int64)
+    y0 = np.floor(y).astype(np.int64)
+    fx = (x - x0)[:, :, None]
+    fy = (y - y0)[:, :, None]
+    x1 = (x0 + 1) % pano_width
+    x0 %= pano_width
+    y1 = np.clip(y0 + 1, 0, pano_height - 1)
+    y0 = np.clip(y0, 0, pano_height - 1)
+    top = panorama[y0, x0] * (1 - fx) + panorama[y0, x1] * fx
+    bottom = panorama[y1, x0] * (1 - fx) + panorama[y1, x1] * fx
+    return top * (1 - fy) + bottom * fy
+
+
+def layer_path(output_dir, name, frame):
+    return os.path.join(output_dir, "layers", name, f"{name.lower()}_{frame:04d}.exr")
+
+
+def panorama_path(output_dir):
+    return os.path.join(output_dir, "layers", BACKGROUND_LAYER, "panorama.exr")
+
+
+def output_frame_path(output_dir, frame):
+    return os.path.join(output_dir, f"frame_{frame:04d}.png")
+
+
+def render_layer(scene, name, path, resolution_percentage):
+    """Renders a single view layer at its own resolution scale to an RGBA EXR file"""
+    for view_layer in scene.view_layers:
+        view_layer.use = view_layer.name == name
+    scene.render.resolution_percentage = max(1, round(resolution_percentage * LAYERS[name]['resolution_scale']))
+    scene.render.film_transparent = LAYERS[name]['transparent']
+    scene.render.filepath = path
+    bpy.ops.render.render(write_still=True)
+
+
+def composite_frame(composite, paths, output_path):
+    """Points the compositor's image nodes at a frame's layer renders and writes the combined frame"""
+    nodes = composite.node_tree.nodes
+    for name, path in paths.items():
+        node = nodes[layer_node_name(name)]
+        if node.image is None:
+            node.image = bpy.data.images.load(path)
+            node.image.name = layer_node_name(name)
+        else:
+            node.image.filepath = path
+            node.image.reload()
+    composite.render.filepath = output_path
+    bpy.ops.render.render(write_still=True, scene=composite.name)
+
+
+def panorama_shell(scene, views):
+    """Returns the background shell when the background can be rendered once and reprojected, else None"""
+    if oiio is None:
+        print("Background: OpenImageIO is not available, rendering the background every frame")
+        return None
+    if background_is_animated(scene):
+        print("Background: animated, rendering the background every frame")
+        return None
+    if any(view['type'] != 'PERSP' for view in views):
+        print("Background: not every camera is perspective, rendering the background every frame")
+        return None
+    shell = background_shell(views)
+    if shell is None:
+        print("Background: a camera leaves the star shells, rendering the background every frame")
+    return shell
+
+
+def layer_size(scene, name, resolution_percentage):
+    scale = resolution_percentage / 100 * LAYERS[name]['resolution_scale']
+    return max(1, round(scene.render.resolution_x * scale)), max(1, round(scene.render.resolution_y * scale))
+
+
+def render_layered(scene=None, output_dir=None):
+    """Renders every layer with its own budget, the background once as a panorama, and composites the frames"""
+    scene = scene or bpy.context.scene
+    output_dir = output_dir or bpy.path.abspath("//layered")
+    for name in LAYERS:
+        os.makedirs(os.path.dirname(layer_path(output_dir, name, 0)), exist_ok=True)
+
+    setup_view_layers(scene)
+    names = [name for name in LAYERS if layer_has_content(scene, name)]
+    for name in LAYERS:
+        if name not in names:
+            print(f"{name}: nothing to render in this layer, skipping it")
+    composite = setup_composite_scene(scene, names)
+
+    render = scene.render
+    image_settings = render.image_settings
+    saved = [(struct, attribute, getattr(struct, attribute)) for struct, attribute in (
+        (render, 'filepath'), (render, 'resolution_percentage'), (render, 'film_transparent'),
+        (render, 'use_compositing'), (image_settings, 'file_format'), (image_settings, 'color_mode'),
+        (image_settings, 'color_depth'), (scene.cycles, 'use_layer_samples'), (scene.cycles, 'use_denoising'),
+    )]
+    saved += [(view_layer, 'use', view_layer.use) for view_layer in scene.view_layers]
+    current_frame = scene.frame_current
+    resolution_percentage = render.resolution_percentage
+
+    frames = range(scene.frame_start, scene.frame_end + 1)
+    background_renders = 0
+    reprojected = 0
+    try:
+        # Layers are stacked by alpha, render_layer makes every layer but the bottom one transparent
+        render.use_compositing = False
+        image_settings.file_format = 'OPEN_EXR'
+        image_settings.color_mode = 'RGBA'
+        image_settings.color_depth = '16'
+        scene.cycles.use_layer_samples = 'USE'
+        scene.cycles.use_denoising = True
+
+        # Markers can switch cameras, so every frame's view is collected before deciding on the panorama
+        views = {}
+        for frame in frames:
+            scene.frame_set(frame)
+            views[frame] = camera_view(scene)
+
+        shell = panorama_shell(scene, list(views.values()))
+        panorama = None
+        width, height = layer_size(scene, BACKGROUND_LAYER, resolution_percentage)
+        if shell is not None:
+            needed_width = panorama_width(views.values(), shell, width, height)
+            if needed_width > PANORAMA_MAX_WIDTH:
+                print(f"Background: a panorama as sharp as a direct render needs {needed_width} px, more than "
+                      f"{PANORAMA_MAX_WIDTH}, rendering the background every frame")
+                shell = None
+        if shell is not None:
+            render_panorama(scene, shell[0], needed_width, panorama_path(output_dir))
+            panorama = read_image(panorama_path(output_dir))
+            background_renders += 1
+
+        for frame in frames:
+            scene.frame_set(frame)
+            paths = {name: layer_path(output_dir, name, frame) for name in names}
+            for name in names:
+                if name != BACKGROUND_LAYER:
+                    render_layer(scene, name, paths[name], resolution_percentage)
+                elif panorama is not None:
+                    write_image(paths[name], reproject_background(panorama, views[frame], shell, width, height))
+                    reprojected += 1
+                else:
+                    render_layer(scene, name, paths[name], resolution_percentage)
+                    background_renders += 1
+            composite_frame(composite, paths, output_frame_path(output_dir, frame))
+    finally:
+        for struct, attribute, value in saved:
+            setattr(struct, attribute, value)
+        scene.frame_set(current_frame)
+
+    total = len(frames)
+    reuse = 1 - background_renders / total if total else 0.0
+    print(f"Layered render: {total} frames, background rendered {background_renders} times "
+          f"({reprojected} frames reprojected, {reuse:.0%} reuse)")
+    for name in names:
+        layer = LAYERS[name]
+        print(f"  {name}: {layer['samples']} samples, {layer['resolution_scale']:.0%} resolution, "
+              f"denoising {'on' if layer['denoise'] else 'off'}")
+    return {'frames': total, 'background_renders': background_renders, 'reprojected': reprojected}
+
+
+def main():
+    print("Rendering layered passes...")
+    render_layered()
+    print("Layered render completed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -32,12 +32,15 @@ def organize_hierarchie():
                 collections["External Lights"].objects.link(obj)
             else:
                 collections["Lighting"].objects.link(obj)
-        elif obj.type == 'MESH' and "Sphere" in obj.name:  # MESH (Sphere) go to Planets collection
+        elif obj.type == 'MESH' and ("Sphere" in obj.name or "Swarm" in obj.name):  # Spheres and swarms go to Planets
             collections["Planets"].objects.link(obj)
-        elif obj.type == 'CAMERA':  # Cameras go to the Camera collection
+        elif obj.type in {'CAMERA', 'EMPTY'}:  # Cameras and their tracking targets go to the Camera collection
             collections["Camera"].objects.link(obj)
         elif "Deep_Space_Stars" in obj.name:  # Deep_Space_Stars in object name (prefix)
             collections["SpaceEnvironnement"].objects.link(obj)  # Corrected to match the collection name
+        else:
+            # Objects of no category stay in the scene, unlinked they would be purged as orphans
+            bpy.context.scene.collection.objects.link(obj)
 
     # Reorganize collections in the Outliner (ensure visibility and hierarchy)
     scene_collections = list(bpy.context.scene.collection.children)
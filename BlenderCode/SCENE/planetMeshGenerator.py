@@ -0,0 +1,250 @@
+import math
+import os
+import sys
+import zlib
+from functools import lru_cache
+
+import bpy
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from ShadersPlanets.shaderConfigLoader import ShaderConfigLoader
+
+MAX_OCTAVES = 6
+CRATER_COUNT = 24
+RELIEF = {'cratered': 0.06, 'banded': 0.015, 'fbm': 0.03}
+
+
+@lru_cache(maxsize=None)
+def uv_sphere_topology(segments=64, rings=32):
+    """Returns the unit UV sphere vertices, polygon loop starts, loop vertex indices and loop UVs"""
+    ring_angles = np.linspace(0.0, math.pi, rings + 1)[1:-1]
+    segment_angles = np.linspace(0.0, 2.0 * math.pi, segments, endpoint=False)
+    ring_z = np.cos(ring_angles)[:, None]
+    ring_radius = np.sin(ring_angles)[:, None]
+    body = np.stack([
+        np.broadcast_to(ring_radius * np.cos(segment_angles), (rings - 1, segments)),
+        np.broadcast_to(ring_radius * np.sin(segment_angles), (rings - 1, segments)),
+        np.broadcast_to(ring_z, (rings - 1, segments)),
+    ], axis=-1).reshape(-1, 3)
+    vertices = np.concatenate([[(0.0, 0.0, 1.0)], body, [(0.0, 0.0, -1.0)]]).astype(np.float32)
+
+    south = len(vertices) - 1
+    segment = np.arange(segments)
+    following = (segment + 1) % segments
+
+    def ring_vertex(ring, index):
+        return 1 + ring * segments + index
+
+    loops = []
+    uvs = []
+    u = segment / segments
+    u_next = (segment + 1) / segments
+
+    # North cap triangles
+    loops.append(np.stack([np.zeros(segments, dtype=np.int64), ring_vertex(0, segment), ring_vertex(0, following)], 1))
+    uvs.append(np.stack([np.stack([(u + u_next) / 2, np.ones(segments)], 1),
+                         np.stack([u, np.full(segments, 1 - 1 / rings)], 1),
+                         np.stack([u_next, np.full(segments, 1 - 1 / rings)], 1)], 1))
+
+    # Quad bands; UVs use u_next rather than wrapping so the seam column stays continuous
+    for ring in range(rings - 2):
+        v_top = 1 - (ring + 1) / rings
+        v_bottom = 1 - (ring + 2) / rings
+        loops.append(np.stack([ring_vertex(ring, segment), ring_vertex(ring + 1, segment),
+                               ring_vertex(ring + 1, following), ring_vertex(ring, following)], 1))
+        uvs.append(np.stack([np.stack([u, np.full(segments, v_top)], 1),
+                             np.stack([u, np.full(segments, v_bottom)], 1),
+                             np.stack([u_next, np.full(segments, v_bottom)], 1),
+                             np.stack([u_next, np.full(segments, v_top)], 1)], 1))
+
+    # South cap triangles
+    loops.append(np.stack([ring_vertex(rings - 2, segment), np.full(segments, south), ring_vertex(rings - 2, following)], 1))
+    uvs.append(np.stack([np.stack([u, np.full(segments, 1 / rings)], 1),
+                         np.stack([(u + u_next) / 2, np.zeros(segments)], 1),
+                         np.stack([u_next, np.full(segments, 1 / rings)], 1)], 1))
+
+    loop_vertices = np.concatenate([block.reshape(-1) for block in loops]).astype(np.int32)
+    loop_totals = np.concatenate([np.full(len(block), block.shape[1]) for block in loops]).astype(np.int32)
+    loop_starts = (np.cumsum(loop_totals) - loop_totals).astype(np.int32)
+    loop_uvs = np.concatenate([block.reshape(-1, 2) for block in uvs]).astype(np.float32)
+    return vertices, loop_starts, loop_totals, loop_vertices, loop_uvs
+
+
+@lru_cache(maxsize=None)
+def ico_sphere_topology(subdivisions=4):
+    """Returns the unit ico sphere vertices, polygon loop starts, loop vertex indices and loop UVs"""
+    phi = (1.0 + math.sqrt(5.0)) / 2.0
+    vertices = [(-1, phi, 0), (1, phi, 0), (-1, -phi, 0), (1, -phi, 0), (0, -1, phi), (0, 1, phi),
+                (0, -1, -phi), (0, 1, -phi), (phi, 0, -1), (phi, 0, 1), (-phi, 0, -1), (-phi, 0, 1)]
+    faces = [(0, 11, 5), (0, 5, 1), (0, 1, 7), (0, 7, 10), (0, 10, 11), (1, 5, 9), (5, 11, 4), (11, 10, 2),
+             (10, 7, 6), (7, 1, 8), (3, 9, 4), (3, 4, 2), (3, 2, 6), (3, 6, 8), (3, 8, 9), (4, 9, 5),
+             (2, 4, 11), (6, 2, 10), (8, 6, 7), (9, 8, 1)]
+
+    for _ in range(subdivisions):
+        midpoints = {}
+
+        def midpoint(a, b):
+            key = (min(a, b), max(a, b))
+            if key not in midpoints:
+                midpoints[key] = len(vertices)
+                vertices.append(tuple((vertices[a][axis] + vertices[b][axis]) / 2 for axis in range(3)))
+            return midpoints[key]
+
+        subdivided = []
+        for a, b, c in faces:
+            ab, bc, ca = midpoint(a, b), midpoint(b, c), midpoint(c, a)
+            subdivided.extend([(a, ab, ca), (b, bc, ab), (c, ca, bc), (ab, bc, ca)])
+        faces = subdivided
+
+    vertices = np.array(vertices, dtype=np.float64)
+    vertices /= np.linalg.norm(vertices, axis=1)[:, None]
+    loop_vertices = np.array(faces, dtype=np.int32).reshape(-1)
+
+    # Spherical projection UVs, matching the equirectangular layout of baked planet textures
+    corners = vertices[loop_vertices]
+    u = (np.arctan2(corners[:, 1], corners[:, 0]) / (2 * math.pi) % 1.0).reshape(-1, 3)
+    v = np.arccos(np.clip(corners[:, 2], -1.0, 1.0)) / -math.pi + 1.0
+
+    # A pole has no longitude of its own, it takes the mean of the other two corners once they are unwrapped
+    pole = (np.abs(corners[:, 2]) > 1.0 - 1e-6).reshape(-1, 3)
+    u[pole] = np.nan
+
+    # Triangles crossing the seam would span the whole map: move their low corners past u = 1, the texture repeats
+    crossing = np.nanmax(u, axis=1) - np.nanmin(u, axis=1) > 0.5
+    u[crossing] = np.where(u[crossing] < 0.5, u[crossing] + 1.0, u[crossing])
+    u = np.where(pole, np.nanmean(u, axis=1)[:, None], u)
+    loop_uvs = np.stack([u.ravel(), v], axis=1)
+    loop_totals = np.full(len(faces), 3, dtype=np.int32)
+    loop_starts = np.arange(0, 3 * len(faces), 3, dtype=np.int32)
+    return vertices.astype(np.float32), loop_starts, loop_totals, loop_vertices, loop_uvs.astype(np.float32)
+
+
+def lattice_values(ix, iy, iz, seed):
+    """Hashes integer lattice coordinates into pseudo-random values in [0, 1]"""
+    h = (ix * 73856093) ^ (iy * 19349663) ^ (iz * 83492791) ^ ((seed * 2654435761) & 0x7FFFFFFF)
+    h = (h ^ (h >> 13)) * 1274126177
+    h ^= h >> 16
+    return (h & 0xFFFF) / 65535.0
+
+
+def value_noise(points, seed=0):
+    """Smooth 3D value noise in [0, 1] for an (N, 3) array of points"""
+    cell = np.floor(points).astype(np.int64)
+    fraction = points - cell
+    fade = fraction * fraction * (3.0 - 2.0 * fraction)
+
+    result = np.zeros(len(points))
+    for corner in range(8):
+        offset = np.array([(corner >> axis) & 1 for axis in range(3)])
+        weight = np.prod(np.where(offset, fade, 1.0 - fade), axis=1)
+        corner_cell = cell + offset
+        result += weight * lattice_values(corner_cell[:, 0], corner_cell[:, 1], corner_cell[:, 2], seed)
+    return result
+
+
+def fractal_noise(points, scale, octaves, seed=0):
+    """Sums octaves of value noise into fractal noise in [-1, 1]"""
+    total = np.zeros(len(points))
+    amplitude = 1.0
+    normalization = 0.0
+    for octave in range(octaves):
+        total += amplitude * (value_noise(points * scale * 2.0 ** octave, seed + octave) * 2.0 - 1.0)
+        normalization += amplitude
+        amplitude *= 0.5
+    return total / normalization
+
+
+def surface_style(config):
+    """Picks the relief style of a planet from its shader config"""
+    if 'gas' in config.name.lower() or config.shader_type == 'nebula':
+        return 'banded'
+    if config.shader_type in ('principled', 'inferno'):
+        return 'cratered'
+    return 'fbm'
+
+
+def crater_field(normals, count, rng):
+    """Bowl-shaped craters with raised rims at random spots of the unit sphere"""
+    centers = rng.normal(size=(count, 3))
+    centers /= np.linalg.norm(centers, axis=1)[:, None]
+    sizes = rng.uniform(0.08, 0.35, count)
+    depths = rng.uniform(0.5, 1.0, count)
+
+    # Angular distance of every vertex to every crater, in crater radii
+    distance = np.arccos(np.clip(normals @ centers.T, -1.0, 1.0)) / sizes
+    bowl = np.where(distance < 1.0, distance * distance - 1.0, 0.0)
+    rim = np.exp(-((distance - 1.0) / 0.25) ** 2) * 0.3
+    return ((bowl + rim) * depths).sum(axis=1)
+
+
+def displace(vertices, config, seed, relief=None, max_octaves=MAX_OCTAVES):
+    """Returns per-vertex radial displacement for the planet's config"""
+    style = surface_style(config)
+    relief = RELIEF[style] if relief is None else relief
+    octaves = max(1, min(int(config.noise_detail), max_octaves))
+    # Shader noise scales are tuned for texture detail; geometry needs far broader features
+    scale = config.noise_scale / 10.0
+
+    if style == 'banded':
+        warp = fractal_noise(vertices, scale, octaves, seed) * 0.3
+        return relief * np.sin((vertices[:, 2] + warp) * config.noise_scale)
+    if style == 'cratered':
+        rng = np.random.default_rng(seed)
+        return relief * (0.5 * fractal_noise(vertices, scale, octaves, seed) + crater_field(vertices, CRATER_COUNT, rng))
+    return relief * fractal_noise(vertices, scale, octaves, seed)
+
+
+def build_planet_mesh(name, config=None, radius=1.0, kind='uv', segments=64, rings=32, subdivisions=4,
+                      relief=None, seed=None):
+    """Builds a planet mesh from cached sphere topology, displaced by the config's fractal noise"""
+    if kind == 'ico':
+        unit, loop_starts, loop_totals, loop_vertices, loop_uvs = ico_sphere_topology(subdivisions)
+    else:
+        unit, loop_starts, loop_totals, loop_vertices, loop_uvs = uv_sphere_topology(segments, rings)
+
+    vertices = unit.astype(np.float64)
+    if config is not None:
+        seed = zlib.crc32(name.encode('utf-8')) if seed is None else seed
+        vertices = vertices * (1.0 + displace(vertices, config, seed, relief))[:, None]
+    vertices *= radius
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(vertices))
+    mesh.vertices.foreach_set("co", vertices.astype(np.float32).ravel())
+    mesh.loops.add(len(loop_vertices))
+    mesh.loops.foreach_set("vertex_index", loop_vertices)
+    mesh.polygons.add(len(loop_starts))
+    mesh.polygons.foreach_set("loop_start", loop_starts)
+    if not bpy.types.MeshPolygon.bl_rna.properties['loop_total'].is_readonly:
+        mesh.polygons.foreach_set("loop_total", loop_totals)
+    mesh.polygons.foreach_set("use_smooth", np.ones(len(loop_starts), dtype=bool))
+    mesh.uv_layers.new(name="UVMap").data.foreach_set("uv", loop_uvs.ravel())
+    mesh.update(calc_edges=True)
+    return mesh
+
+
+def create_planet(location, radius=0.5, config=None, seed=None, **kwargs):
+    """Creates a planet object with real relief geometry, without any subdivision modifier"""
+    name = f"Sphere_{config.name}" if config is not None else "Sphere"
+    # Planets sharing a config get their own relief unless the caller passes a seed
+    if seed is None:
+        seed = zlib.crc32(f"{name}{tuple(location)}".encode('utf-8'))
+    mesh = build_planet_mesh(name, config, radius, seed=seed, **kwargs)
+    planet = bpy.data.objects.new(mesh.name, mesh)
+    planet.location = location
+    bpy.context.scene.collection.objects.link(planet)
+    return planet
+
+
+def main():
+    print("Generating planet meshes...")
+    configs = ShaderConfigLoader.load_config()
+    for index, config in enumerate(configs.values()):
+        create_planet((index * 2.5, 0, 0), radius=1.0, config=config, seed=index)
+    print(f"Generated {len(configs)} planet meshes.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+import math
+import os
+import sys
+
+import bpy
+import numpy as np
+from bpy.app.handlers import persistent
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from incrementalRender import DYNAMIC_DATA_KEY
+from ShadersPlanets.planetShaderFactory import PlanetShaderFactory
+from ShadersPlanets.shaderConfigLoader import ShaderConfigLoader
+
+SWARM_OBJECT_NAME = "PlanetSwarm"
+PROTOTYPE_COLLECTION_NAME = "PlanetSwarmPrototypes"
+NODE_GROUP_NAME = "PlanetSwarmInstancer"
+
+# Group input that hands the point positions over to a trajectory cache written by the frame change handler
+CACHE_INPUT_NAME = "Use Trajectory Cache"
+
+WORM_FRAMES = 250
+WORM_DELAY_FRAMES = 4
+WORM_AMPLITUDE = 2.5
+
+# Memory-mapped trajectory caches, keyed by file path
+_trajectory_caches = {}
+
+
+def worm_state(delays, frame, frames=WORM_FRAMES, amplitude=WORM_AMPLITUDE):
+    """Vectorized animate_spheres_worm: returns positions (N, 3), rotations (N, 3) and scales (N,) at a frame.
+
+    add_worm_motion builds the same motion in the swarm's node tree, the two have to be changed together.
+    """
+    # Keyframes only exist on [0, frames), Blender holds the end values outside of it
+    frame = min(max(frame, 0), frames - 1)
+    delayed = frame - np.asarray(delays, dtype=np.float64)
+    t = delayed / frames
+
+    positions = np.empty((len(delayed), 3))
+    positions[:, 0] = t * 25.0
+    positions[:, 1] = np.sin(delayed * 0.1) * amplitude + np.cos(delayed * 0.05) * (amplitude * 0.3)
+    positions[:, 2] = 2.0 + np.cos(delayed * 0.1) * amplitude + np.sin(delayed * 0.05) * (amplitude * 0.3)
+
+    rotations = np.empty((len(delayed), 3))
+    rotations[:, 0] = np.sin(delayed * 0.15) * np.cos(delayed * 0.12)
+    rotations[:, 1] = np.cos(delayed * 0.12) * np.sin(delayed * 0.15)
+    rotations[:, 2] = t * math.pi * 2
+
+    scales = 1 + np.sin(delayed * 0.2) * np.cos(delayed * 0.12)
+    return positions, rotations, scales
+
+
+def worm_trajectories(num_planets, frames=WORM_FRAMES, delay_frames=WORM_DELAY_FRAMES):
+    """Returns the worm positions (N, F, 3), rotations (N, F, 3) and scales (N, F) for every frame"""
+    delays = np.arange(num_planets) * delay_frames
+    states = [worm_state(delays, frame, frames) for frame in range(frames)]
+    positions = np.stack([state[0] for state in states], axis=1)
+    rotations = np.stack([state[1] for state in states], axis=1)
+    scales = np.stack([state[2] for state in states], axis=1)
+    return positions, rotations, scales
+
+
+def create_prototypes(configs, segments=32, ring_count=16):
+    """Creates one unit sphere per shader, all sharing a single mesh, in an unlinked collection"""
+    collection = bpy.data.collections.get(PROTOTYPE_COLLECTION_NAME)
+    if collection is None:
+        collection = bpy.data.collections.new(PROTOTYPE_COLLECTION_NAME)
+    for obj in list(collection.objects):
+        bpy.data.objects.remove(obj, do_unlink=True)
+
+    bpy.ops.mesh.primitive_uv_sphere_add(radius=1.0, segments=segments, ring_count=ring_count)
+    template = bpy.context.active_object
+    mesh = template.data
+    mesh.name = "PlanetSwarmSphere"
+    for polygon in mesh.polygons:
+        polygon.use_smooth = True
+    mesh.materials.clear()
+    mesh.materials.append(None)
+    bpy.data.objects.remove(template, do_unlink=True)
+
+    # Collection Info hands the children out in collection order, which is the shader index order
+    for index, config in enumerate(configs.values()):
+        prototype = bpy.data.objects.new(f"SwarmPrototype_{index:03d}_{config.name}", mesh)
+        prototype.material_slots[0].link = 'OBJECT'
+        prototype.material_slots[0].material = PlanetShaderFactory.create_shader(
+            config.name, config.noise_scale, config.noise_detail, config.color_primary, config.color_secondary,
+            config.shader_type
+        )
+        collection.objects.link(prototype)
+
+    return collection
+
+
+def add_worm_motion(nodes, links, delay, frames=WORM_FRAMES, amplitude=WORM_AMPLITUDE):
+    """Builds worm_state from Scene Time and the delay attribute; returns the position, rotation and scale sockets.
+
+    Computing the motion in the tree keeps it working in any process that renders the file, subframes included.
+    """
+    def connect(value, socket):
+        if isinstance(value, (int, float)):
+            socket.default_value = value
+        else:
+            links.new(value, socket)
+
+    def operation(name, *inputs):
+        node = nodes.new('ShaderNodeMath')
+        node.operation = name
+        for value, socket in zip(inputs, node.inputs):
+            connect(value, socket)
+        return node.outputs['Value']
+
+    def combine(*inputs):
+        node = nodes.new('ShaderNodeCombineXYZ')
+        for value, socket in zip(inputs, node.inputs):
+            connect(value, socket)
+        return node.outputs['Vector']
+
+    # Keyframes only exist on [0, frames), Blender holds the end values outside of it
+    scene_time = nodes.new('GeometryNodeInputSceneTime')
+    frame = operation('MINIMUM', operation('MAXIMUM', scene_time.outputs['Frame'], 0.0), frames - 1)
+    delayed = operation('SUBTRACT', frame, delay)
+    t = operation('DIVIDE', delayed, frames)
+
+    def wave(function, rate, factor=1.0):
+        return operation('MULTIPLY', operation(function, operation('MULTIPLY', delayed, rate)), factor)
+
+    position = combine(
+        operation('MULTIPLY', t, 25.0),
+        operation('ADD', wave('SINE', 0.1, amplitude), wave('COSINE', 0.05, amplitude * 0.3)),
+        operation('ADD', 2.0, operation('ADD', wave('COSINE', 0.1, amplitude), wave('SINE', 0.05, amplitude * 0.3))),
+    )
+    # sin(0.15 d) * cos(0.12 d) tumbles the X and Y axes alike
+    tumble = operation('MULTIPLY', wave('SINE', 0.15), wave('COSINE', 0.12))
+    rotation = combine(tumble, tumble, operation('MULTIPLY', t, math.pi * 2))
+    scale = operation('ADD', 1.0, operation('MULTIPLY', wave('SINE', 0.2), wave('COSINE', 0.12)))
+    return position, rotation, scale
+
+
+def create_instancer_node_group(prototypes):
+    """Builds the Geometry Nodes tree that instances the prototypes on the swarm points"""
+    node_group = bpy.data.node_groups.get(NODE_GROUP_NAME)
+    if node_group is None:
+        node_group = bpy.data.node_groups.new(NODE_GROUP_NAME, 'GeometryNodeTree')
+        node_group.interface.new_socket(name="Geometry", in_out='INPUT', socket_type='NodeSocketGeometry')
+        node_group.interface.new_socket(name="Geometry", in_out='OUTPUT', socket_type='NodeSocketGeometry')
+    if CACHE_INPUT_NAME not in node_group.interface.items_tree:
+        node_group.interface.new_socket(name=CACHE_INPUT_NAME, in_out='INPUT', socket_type='NodeSocketBool')
+    nodes = node_group.nodes
+    links = node_group.links
+    nodes.clear()
+
+    group_input = nodes.new('NodeGroupInput')
+    group_output = nodes.new('NodeGroupOutput')
+
+    collection_info = nodes.new('GeometryNodeCollectionInfo')
+    collection_info.transform_space = 'ORIGINAL'
+    collection_info.inputs['Collection'].default_value = prototypes
+    collection_info.inputs['Separate Children'].default_value = True
+    collection_info.inputs['Reset Children'].default_value = True
+
+    def named_attribute(name, data_type):
+        node = nodes.new('GeometryNodeInputNamedAttribute')
+        node.data_type = data_type
+        node.inputs['Name'].default_value = name
+        return node.outputs['Attribute']
+
+    position, rotation, worm_scale = add_worm_motion(nodes, links, named_attribute("delay", 'FLOAT'))
+
+    # A trajectory cache, like the overlap resolver's, has already written the positions into the points
+    use_worm_position = nodes.new('FunctionNodeBooleanMath')
+    use_worm_position.operation = 'NOT'
+    links.new(group_input.outputs[CACHE_INPUT_NAME], use_worm_position.inputs[0])
+    set_position = nodes.new('GeometryNodeSetPosition')
+    links.new(group_input.outputs['Geometry'], set_position.inputs['Geometry'])
+    links.new(use_worm_position.outputs['Boolean'], set_position.inputs['Selection'])
+    links.new(position, set_position.inputs['Position'])
+
+    # radius_fit is the overlap resolver's shrink factor, 1 until it runs
+    radius = nodes.new('ShaderNodeMath')
+    radius.operation = 'MULTIPLY'
+    links.new(named_attribute("radius", 'FLOAT'), radius.inputs[0])
+    links.new(named_attribute("radius_fit", 'FLOAT'), radius.inputs[1])
+    scale = nodes.new('ShaderNodeMath')
+    scale.operation = 'MULTIPLY'
+    links.new(radius.outputs['Value'], scale.inputs[0])
+    links.new(worm_scale, scale.inputs[1])
+
+    instance = nodes.new('GeometryNodeInstanceOnPoints')
+    instance.inputs['Pick Instance'].default_value = True
+    links.new(set_position.outputs['Geometry'], instance.inputs['Points'])
+    links.new(collection_info.outputs['Instances'], instance.inputs['Instance'])
+    links.new(named_attribute("shader_index", 'INT'), instance.inputs['Instance Index'])
+    links.new(rotation, instance.inputs['Rotation'])
+    links.new(scale.outputs['Value'], instance.inputs['Scale'])
+    links.new(instance.outputs['Instances'], group_output.inputs['Geometry'])
+
+    return node_group
+
+
+def create_swarm(num_planets=100000, seed=None, delay_frames=WORM_DELAY_FRAMES):
+    """Creates a single point object carrying one point per planet, moved and instanced through Geometry Nodes"""
+    configs = ShaderConfigLoader.load_config()
+    rng = np.random.default_rng(seed)
+
+    mesh = bpy.data.meshes.new(SWARM_OBJECT_NAME)
+    mesh.vertices.add(num_planets)
+
+    for name, domain_type in (("radius", 'FLOAT'), ("radius_fit", 'FLOAT'), ("delay", 'FLOAT'),
+                              ("shader_index", 'INT')):
+        mesh.attributes.new(name=name, type=domain_type, domain='POINT')
+
+    radii = 0.25 + rng.random(num_planets, dtype=np.float32) * 0.15
+    delays = np.arange(num_planets, dtype=np.float32) * delay_frames
+    shader_indices = rng.integers(0, max(len(configs), 1), num_planets, dtype=np.int32)
+    mesh.attributes["radius"].data.foreach_set("value", radii)
+    mesh.attributes["radius_fit"].data.foreach_set("value", np.ones(num_planets, dtype=np.float32))
+    mesh.attributes["delay"].data.foreach_set("value", delays)
+    mesh.attributes["shader_index"].data.foreach_set("value", shader_indices)
+
+    swarm = bpy.data.objects.new(SWARM_OBJECT_NAME, mesh)
+    bpy.context.scene.collection.objects.link(swarm)
+
+    modifier = swarm.modifiers.new(name="Instancer", type='NODES')
+    modifier.node_group = create_instancer_node_group(create_prototypes(configs))
+
+    return swarm
+
+
+def cache_input_identifier(swarm):
+    modifier = swarm.modifiers["Instancer"]
+    return modifier.node_group.interface.items_tree[CACHE_INPUT_NAME].identifier
+
+
+def store_trajectories(swarm, positions, path):
+    """Saves precomputed (N, F, 3) positions as a .npy file and makes the swarm follow them instead of the worm.
+
+    The cache is read by a frame change handler, which a fresh Blender process only has once this module has
+    registered it again; without it the swarm holds the positions of the last frame it was saved on.
+    """
+    if not path.endswith('.npy'):
+        path += '.npy'
+    np.save(path, np.asarray(positions, dtype=np.float32))
+    _trajectory_caches.pop(path, None)
+    swarm["trajectory_cache"] = path
+    swarm.modifiers["Instancer"][cache_input_identifier(swarm)] = True
+
+    # The handler rewrites the points every frame, so renders must not race the UI
+    bpy.context.scene.render.use_lock_interface = True
+    swarm[DYNAMIC_DATA_KEY] = True
+    register()
+    update_swarm(swarm, bpy.context.scene.frame_current)
+
+
+def update_swarm(swarm, frame):
+    """Writes the swarm's cached per-planet positions for the given frame"""
+    cache_path = swarm.get("trajectory_cache")
+    if not cache_path or not os.path.exists(cache_path):
+        return
+    if cache_path not in _trajectory_caches:
+        _trajectory_caches[cache_path] = np.load(cache_path, mmap_mode='r')
+    cached = _trajectory_caches[cache_path]
+    positions = cached[:, min(max(frame, 0), cached.shape[1] - 1)]
+
+    mesh = swarm.data
+    mesh.vertices.foreach_set("co", np.ascontiguousarray(positions, dtype=np.float32).ravel())
+    mesh.update()
+
+
+@persistent
+def swarm_frame_change(scene, depsgraph=None):
+    """Frame change handler that moves every swarm with a trajectory cache"""
+    for obj in scene.objects:
+        if obj.type == 'MESH' and obj.name.startswith(SWARM_OBJECT_NAME) and obj.get("trajectory_cache"):
+            update_swarm(obj, scene.frame_current)
+
+
+def register():
+    unregister()
+    bpy.app.handlers.frame_change_pre.append(swarm_frame_change)
+
+
+def unregister():
+    for handler in list(bpy.app.handlers.frame_change_pre):
+        if getattr(handler, '__name__', None) == swarm_frame_change.__name__:
+            bpy.app.handlers.frame_change_pre.remove(handler)
+
+
+def main():
+    print("Creating instanced planet swarm...")
+    swarm = create_swarm()
+    print(f"Planet swarm created with {len(swarm.data.vertices)} planets in a single object.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,410 @@
+import json
+import os
+import platform
+import time
+
+import bmesh
+import bpy
+
+# Per-machine calibration tables written by calibrate(), keyed by machine_key()
+CALIBRATION_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'render_cost_calibration.json')
+CALIBRATION_SCENE_NAME = "RenderCostCalibration"
+
+# Reference render of the calibration: small enough to take seconds, two sample counts so the per-sample slope
+# leaves out scene sync and BVH build
+CALIBRATION_RESOLUTION = (480, 270)
+CALIBRATION_SAMPLES = (8, 40)
+CALIBRATION_LIGHT_COUNT = 4
+CALIBRATION_SPHERE_SEGMENTS = (512, 256)
+
+# Times reference renders and records this machine's table before estimating
+RUN_CALIBRATION = False
+
+# Used where a machine has no calibration of its own; the thresholds are policy, not measurements
+DEFAULT_CALIBRATION = {
+    "seconds_per_megapixel_sample": 0.0012,
+    "reference_frame_seconds": 45.0,
+    "slowdown_warning_factor": 10.0,
+    "driver_warning_share": 0.15,
+    "texture_memory_warning_mb": 2048.0,
+    "bounce_reference": 12,
+    "light_cost": {"SUN": 0.02, "POINT": 0.03, "SPOT": 0.03, "AREA": 0.06},
+    "world_volume_cost": 1.5,
+    "material_volume_cost": 0.8,
+    "transmission_cost": 1.2,
+    "caustics_cost": 0.5,
+    "cost_per_million_triangles": 0.15
+}
+
+TRANSMISSIVE_NODES = {'BSDF_GLASS', 'BSDF_REFRACTION', 'BSDF_TRANSPARENT'}
+VOLUME_NODES = {'PRINCIPLED_VOLUME', 'VOLUME_SCATTER', 'VOLUME_ABSORPTION'}
+
+
+def machine_key():
+    """Identifies this machine's render hardware: the host name and the Cycles devices in use"""
+    devices = "CPU"
+    addon = bpy.context.preferences.addons.get('cycles')
+    if addon is not None:
+        preferences = addon.preferences
+        if preferences.compute_device_type != 'NONE' and bpy.context.scene.cycles.device == 'GPU':
+            preferences.get_devices()
+            devices = ", ".join(sorted({device.name for device in preferences.devices if device.use})) or devices
+    return f"{platform.node()}/{devices}"
+
+
+def read_calibration_tables(calibration_path=CALIBRATION_PATH):
+    try:
+        with open(calibration_path, 'r') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def load_calibration(calibration_path=CALIBRATION_PATH, machine=None):
+    """Loads this machine's calibration table, falling back to the built-in defaults"""
+    machine = machine or machine_key()
+    calibration = dict(DEFAULT_CALIBRATION)
+    table = read_calibration_tables(calibration_path).get(machine)
+    if table is None:
+        print(f"No calibration for {machine} in {calibration_path}, run calibrate() on this machine. "
+              f"Using default calibration.")
+    else:
+        calibration.update(table)
+    return calibration
+
+
+def is_material_transmissive(material):
+    """Returns True if the material's node tree contains a transmissive BSDF"""
+    if not material or not material.use_nodes:
+        return False
+    for node in material.node_tree.nodes:
+        if node.type in TRANSMISSIVE_NODES:
+            return True
+        if node.type == 'BSDF_PRINCIPLED':
+            transmission = node.inputs.get('Transmission Weight') or node.inputs.get('Transmission')
+            if transmission and (transmission.is_linked or transmission.default_value > 0.0):
+                return True
+    return False
+
+
+def has_volume_output(node_tree, output_type):
+    """Returns True if something is plugged into the Volume socket of the tree's output node"""
+    if node_tree is None:
+        return False
+    for node in node_tree.nodes:
+        if node.type == output_type and 'Volume' in node.inputs and node.inputs['Volume'].is_linked:
+            return True
+    return False
+
+
+def render_subdivision_factor(obj):
+    """Returns how many more triangles the render levels of an object's subdivision make than the viewport's"""
+    factor = 1
+    for modifier in obj.modifiers:
+        if modifier.type != 'SUBSURF' or not modifier.show_render:
+            continue
+        viewport_levels = modifier.levels if modifier.show_viewport else 0
+        # Every extra Catmull-Clark level splits each quad into 4
+        factor *= 4 ** max(modifier.render_levels - viewport_levels, 0)
+    return factor
+
+
+def estimate_render_triangles(obj, triangle_counts=None):
+    """Counts the triangles of an evaluated mesh object at its render-level subdivision.
+
+    The evaluated mesh includes every modifier, Geometry Nodes among them; triangle_counts memoizes the
+    meshes that instances share.
+    """
+    triangle_counts = {} if triangle_counts is None else triangle_counts
+    key = (obj.original.name_full, obj.data.as_pointer())
+    if key not in triangle_counts:
+        triangle_counts[key] = len(obj.data.loop_triangles) * render_subdivision_factor(obj.original)
+    return triangle_counts[key]
+
+
+def collect_scene_stats(scene):
+    """Inspects the built scene and gathers everything the cost model depends on"""
+    stats = {
+        'lights': {},
+        'world_volume': has_volume_output(scene.world.node_tree if scene.world else None, 'OUTPUT_WORLD'),
+        'volume_materials': 0,
+        'triangles': 0,
+        'transmissive_triangles': 0,
+        'mesh_objects': 0,
+    }
+
+    # Instances cover the objects Geometry Nodes and particles scatter as well as plain objects
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    volume_materials = set()
+    triangle_counts = {}
+    for instance in depsgraph.object_instances:
+        obj = instance.object
+        if obj.original.hide_render:
+            continue
+        if obj.type == 'LIGHT':
+            light_type = obj.data.type
+            stats['lights'][light_type] = stats['lights'].get(light_type, 0) + 1
+        elif obj.type == 'MESH':
+            triangles = estimate_render_triangles(obj, triangle_counts)
+            stats['mesh_objects'] += 1
+            stats['triangles'] += triangles
+            materials = [slot.material for slot in obj.material_slots if slot.material]
+            if any(is_material_transmissive(material) for material in materials):
+                stats['transmissive_triangles'] += triangles
+            for material in materials:
+                if material.use_nodes and has_volume_output(material.node_tree, 'OUTPUT_MATERIAL'):
+                    volume_materials.add(material.name)
+    stats['volume_materials'] = len(volume_materials)
+    stats['transmissive_share'] = stats['transmissive_triangles'] / stats['triangles'] if stats['triangles'] else 0.0
+
+    render = scene.render
+    scale = render.resolution_percentage / 100
+    stats['megapixels'] = render.resolution_x * scale * render.resolution_y * scale / 1e6
+    stats['frames'] = scene.frame_end - scene.frame_start + 1
+
+    cycles = scene.cycles
+    stats['samples'] = cycles.samples
+    stats['adaptive_sampling'] = cycles.use_adaptive_sampling
+    stats['max_bounces'] = cycles.max_bounces
+    stats['transmission_bounces'] = cycles.transmission_bounces
+    stats['volume_bounces'] = cycles.volume_bounces
+    stats['caustics'] = cycles.caustics_reflective or cycles.caustics_refractive
+
+    texture_bytes = 0
+    for image in bpy.data.images:
+        if image.users == 0 or not image.has_data:
+            continue
+        bytes_per_channel = 4 if image.is_float else 1
+        texture_bytes += image.size[0] * image.size[1] * image.channels * bytes_per_channel
+    stats['texture_memory_mb'] = texture_bytes / (1024 * 1024)
+
+    return stats
+
+
+def estimate_cost(stats, calibration):
+    """Predicts per-frame render time and breaks the multiplier down into cost drivers"""
+    bounce_scale = max(stats['transmission_bounces'], 1) / calibration['bounce_reference']
+
+    drivers = {}
+    for light_type, count in stats['lights'].items():
+        drivers[f"{count} {light_type.lower()} lights"] = calibration['light_cost'].get(light_type, 0.05) * count
+    if stats['world_volume']:
+        drivers["world volume"] = calibration['world_volume_cost'] * max(stats['volume_bounces'], 1)
+    if stats['volume_materials']:
+        drivers[f"{stats['volume_materials']} volume materials"] = calibration['material_volume_cost']
+    if stats['transmissive_share'] > 0:
+        drivers[f"transmissive materials ({stats['transmissive_share']:.0%} of triangles)"] = (
+            calibration['transmission_cost'] * stats['transmissive_share'] * bounce_scale
+        )
+    if stats['caustics']:
+        drivers["caustics"] = calibration['caustics_cost']
+    drivers[f"{stats['triangles'] / 1e6:.1f}M render triangles"] = (
+        calibration['cost_per_million_triangles'] * stats['triangles'] / 1e6
+    )
+
+    base_seconds = calibration['seconds_per_megapixel_sample'] * stats['megapixels'] * stats['samples']
+    multiplier = 1.0 + sum(drivers.values())
+    frame_seconds = base_seconds * multiplier
+
+    ranked = sorted(drivers.items(), key=lambda item: item[1], reverse=True)
+    return {
+        'base_seconds': base_seconds,
+        'multiplier': multiplier,
+        'frame_seconds': frame_seconds,
+        'total_seconds': frame_seconds * stats['frames'],
+        'drivers': [(name, weight / multiplier) for name, weight in ranked],
+    }
+
+
+def build_cost_report(scene=None, calibration=None):
+    """Analyzes the scene and returns the stats, the cost estimate and any warnings"""
+    scene = scene or bpy.context.scene
+    calibration = calibration or load_calibration()
+    stats = collect_scene_stats(scene)
+    estimate = estimate_cost(stats, calibration)
+
+    warnings = []
+    slowdown = estimate['frame_seconds'] / calibration['reference_frame_seconds']
+    if slowdown >= calibration['slowdown_warning_factor']:
+        warnings.append(f"Predicted frame time is {slowdown:.1f}x the reference frame")
+    for name, share in estimate['drivers']:
+        if share >= calibration['driver_warning_share']:
+            warnings.append(f"{name} account for {share:.0%} of the frame cost")
+    if stats['texture_memory_mb'] >= calibration['texture_memory_warning_mb']:
+        warnings.append(f"Textures use {stats['texture_memory_mb']:.0f} MB")
+
+    return {'stats': stats, 'estimate': estimate, 'warnings': warnings}
+
+
+def print_cost_report(report, top_drivers=5):
+    """Prints a readable summary of a cost report"""
+    stats = report['stats']
+    estimate = report['estimate']
+
+    lights = ", ".join(f"{count} {light_type}" for light_type, count in sorted(stats['lights'].items())) or "none"
+    print(f"Lights: {lights}")
+    print(f"World volume: {stats['world_volume']}, volume materials: {stats['volume_materials']}")
+    print(f"Mesh objects: {stats['mesh_objects']}, render triangles: {stats['triangles']:,}, "
+          f"transmissive share: {stats['transmissive_share']:.0%}")
+    print(f"Samples: {stats['samples']} (adaptive: {stats['adaptive_sampling']}), "
+          f"bounces: {stats['max_bounces']} max / {stats['transmission_bounces']} transmission / "
+          f"{stats['volume_bounces']} volume, caustics: {stats['caustics']}")
+    print(f"Resolution: {stats['megapixels']:.2f} MP, texture memory: {stats['texture_memory_mb']:.1f} MB")
+    print(f"Predicted frame time: {estimate['frame_seconds']:.1f}s "
+          f"({estimate['multiplier']:.2f}x base), {stats['frames']} frames: {estimate['total_seconds'] / 3600:.2f}h")
+
+    print("Top cost drivers:")
+    for name, share in estimate['drivers'][:top_drivers]:
+        print(f"  {share:6.1%}  {name}")
+
+    for warning in report['warnings']:
+        print(f"Warning: {warning}")
+
+
+def calibration_material(name, transmissive=False, volume=False):
+    material = bpy.data.materials.new(name)
+    material.use_nodes = True
+    nodes = material.node_tree.nodes
+    if transmissive:
+        principled = nodes["Principled BSDF"]
+        (principled.inputs.get('Transmission Weight') or principled.inputs['Transmission']).default_value = 1.0
+    if volume:
+        scatter = nodes.new('ShaderNodeVolumeScatter')
+        scatter.inputs['Density'].default_value = 0.5
+        material.node_tree.links.new(scatter.outputs['Volume'], nodes["Material Output"].inputs['Volume'])
+    return material
+
+
+def build_calibration_scene(lights=(), world_volume=False, volume=False, transmissive=False, caustics=False,
+                            dense=False):
+    """Builds the reference scene, a lit 3x3 grid of spheres, with the features whose cost is being measured"""
+    scene = bpy.data.scenes.new(CALIBRATION_SCENE_NAME)
+    scene.render.engine = 'CYCLES'
+    scene.render.resolution_x, scene.render.resolution_y = CALIBRATION_RESOLUTION
+    scene.render.resolution_percentage = 100
+    scene.cycles.device = bpy.context.scene.cycles.device
+    scene.cycles.use_adaptive_sampling = False
+    scene.cycles.use_denoising = False
+    scene.cycles.caustics_reflective = caustics
+    scene.cycles.caustics_refractive = caustics
+
+    camera = bpy.data.objects.new("CalibrationCamera", bpy.data.cameras.new("CalibrationCamera"))
+    camera.location = (0.0, -12.0, 0.0)
+    camera.rotation_euler = (1.5708, 0.0, 0.0)
+    scene.collection.objects.link(camera)
+    scene.camera = camera
+
+    for index, light_type in enumerate(('SUN',) + tuple(lights)):
+        light = bpy.data.objects.new(f"CalibrationLight{index}", bpy.data.lights.new(f"CalibrationLight{index}",
+                                                                                       light_type))
+        light.location = (index - 2.0, -6.0, 5.0)
+        scene.collection.objects.link(light)
+
+    world = bpy.data.worlds.new(CALIBRATION_SCENE_NAME)
+    world.use_nodes = True
+    if world_volume:
+        scatter = world.node_tree.nodes.new('ShaderNodeVolumeScatter')
+        scatter.inputs['Density'].default_value = 0.01
+        world.node_tree.links.new(scatter.outputs['Volume'], world.node_tree.nodes["World Output"].inputs['Volume'])
+    scene.world = world
+
+    material = calibration_material(CALIBRATION_SCENE_NAME, transmissive, volume)
+    segments = CALIBRATION_SPHERE_SEGMENTS if dense else (32, 16)
+    mesh = bpy.data.meshes.new(CALIBRATION_SCENE_NAME)
+    sphere = bmesh.new()
+    bmesh.ops.create_uvsphere(sphere, u_segments=segments[0], v_segments=segments[1], radius=1.0)
+    sphere.to_mesh(mesh)
+    sphere.free()
+    mesh.materials.append(material)
+    for row in range(3):
+        for column in range(3):
+            obj = bpy.data.objects.new(f"CalibrationSphere{row}{column}", mesh)
+            obj.location = (3.0 * (column - 1), 0.0, 3.0 * (row - 1))
+            scene.collection.objects.link(obj)
+    return scene
+
+
+def remove_calibration_scene(scene):
+    objects = list(scene.collection.objects)
+    datablocks = {scene, scene.world, *objects, *(obj.data for obj in objects)}
+    datablocks.update(material for obj in objects if obj.type == 'MESH' for material in obj.data.materials)
+    bpy.data.batch_remove([datablock for datablock in datablocks if datablock is not None])
+
+
+def seconds_per_sample(**features):
+    """Renders the reference scene at two sample counts; returns the slope, which excludes sync and BVH build"""
+    scene = build_calibration_scene(**features)
+    try:
+        timings = []
+        for samples in CALIBRATION_SAMPLES:
+            scene.cycles.samples = samples
+            start = time.perf_counter()
+            bpy.ops.render.render(scene=scene.name)
+            timings.append(time.perf_counter() - start)
+        stats = {
+            'volume_bounces': scene.cycles.volume_bounces,
+            'transmission_bounces': scene.cycles.transmission_bounces,
+            'triangles': sum(len(obj.data.loop_triangles) for obj in scene.objects if obj.type == 'MESH'),
+        }
+    finally:
+        remove_calibration_scene(scene)
+    slope = max(timings[1] - timings[0], 1e-6) / (CALIBRATION_SAMPLES[1] - CALIBRATION_SAMPLES[0])
+    return slope, stats
+
+
+def calibrate(calibration_path=CALIBRATION_PATH, machine=None):
+    """Times reference renders on this machine and writes its calibration table, keyed by machine_key()"""
+    machine = machine or machine_key()
+    print(f"Calibrating render cost for {machine}...")
+    base, base_stats = seconds_per_sample()
+
+    def extra_cost(**features):
+        slope, stats = seconds_per_sample(**features)
+        return max(slope / base - 1.0, 0.0), stats
+
+    calibration = dict(DEFAULT_CALIBRATION)
+    megapixels = CALIBRATION_RESOLUTION[0] * CALIBRATION_RESOLUTION[1] / 1e6
+    calibration['seconds_per_megapixel_sample'] = base / megapixels
+
+    calibration['light_cost'] = {}
+    for light_type in ('POINT', 'SPOT', 'AREA'):
+        cost, _ = extra_cost(lights=(light_type,) * CALIBRATION_LIGHT_COUNT)
+        calibration['light_cost'][light_type] = cost / CALIBRATION_LIGHT_COUNT
+    # The reference scene's own sun is part of the base time; a second sun costs as much as a point light
+    calibration['light_cost']['SUN'] = calibration['light_cost']['POINT']
+
+    cost, stats = extra_cost(world_volume=True)
+    calibration['world_volume_cost'] = cost / max(stats['volume_bounces'], 1)
+    calibration['material_volume_cost'], _ = extra_cost(volume=True)
+
+    # Every triangle is transmissive, so the share is 1 and only the bounce scale is left to divide out
+    cost, stats = extra_cost(transmissive=True)
+    bounce_scale = max(stats['transmission_bounces'], 1) / calibration['bounce_reference']
+    calibration['transmission_cost'] = cost / bounce_scale
+    caustics, _ = extra_cost(transmissive=True, caustics=True)
+    calibration['caustics_cost'] = max(caustics - cost, 0.0)
+
+    dense, stats = extra_cost(dense=True)
+    added_triangles = stats['triangles'] - base_stats['triangles']
+    calibration['cost_per_million_triangles'] = dense / (added_triangles / 1e6)
+
+    tables = read_calibration_tables(calibration_path)
+    tables[machine] = calibration
+    with open(calibration_path, 'w') as file:
+        json.dump(tables, file, indent=2, sort_keys=True)
+    print(f"Wrote the calibration of {machine} to {calibration_path}")
+    return calibration
+
+
+def main():
+    if RUN_CALIBRATION:
+        calibrate()
+    print("Estimating render cost...")
+    report = build_cost_report()
+    print_cost_report(report)
+    print("Render cost estimation completed.")
+    return report
+
+
+if __name__ == "__main__":
+    main()
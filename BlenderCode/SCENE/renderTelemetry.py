@@ -0,0 +1,162 @@
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+
+import bpy
+from bpy.app.handlers import persistent
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from cameraAnimations import get_shot_at_frame
+
+PEAK_MEMORY_PATTERN = re.compile(r"Peak[: ]\s*([\d.]+)([MG])")
+SAMPLE_PATTERN = re.compile(r"Sample (\d+)/(\d+)")
+
+# Where a record's value came from: Blender's render status line, or the fallback when no stats line carried it
+SOURCE_STATS = "stats"
+SOURCE_CONFIGURED = "configured"
+SOURCE_PROCESS = "process"
+
+# State shared between the handlers of the frame being rendered
+_telemetry = {
+    'path': None,
+    'run': None,
+    'label': None,
+    'frame': None,
+}
+
+
+def default_telemetry_path():
+    """Returns the JSONL file next to the blend file, or in the temp directory for unsaved files"""
+    directory = bpy.path.abspath("//") if bpy.data.filepath else tempfile.gettempdir()
+    return os.path.join(directory, "render_telemetry.jsonl")
+
+
+def peak_process_memory_mb():
+    """Returns the process peak resident memory, used when Blender's stats carry no peak.
+
+    This is a high-water mark over the whole process lifetime, not the frame's own peak.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def count_visible(scene):
+    """Counts the render-visible mesh objects and lights of the current frame"""
+    objects = 0
+    lights = 0
+    for obj in scene.objects:
+        if obj.hide_render or not obj.visible_get():
+            continue
+        if obj.type == 'LIGHT':
+            lights += 1
+        elif obj.type in {'MESH', 'CURVE', 'SURFACE', 'META', 'FONT', 'VOLUME', 'POINTCLOUD'}:
+            objects += 1
+    return objects, lights
+
+
+@persistent
+def telemetry_render_pre(scene, *args):
+    """Starts timing a frame and snapshots what it is about to render"""
+    shot, camera, shot_start, shot_end = get_shot_at_frame(scene, scene.frame_current)
+    objects, lights = count_visible(scene)
+    _telemetry['frame'] = {
+        'run': _telemetry['run'],
+        'label': _telemetry['label'],
+        'frame': scene.frame_current,
+        'shot': shot,
+        'camera': camera.name if camera else None,
+        'visible_objects': objects,
+        'visible_lights': lights,
+        'samples': scene.cycles.samples,
+        'adaptive_sampling': scene.cycles.use_adaptive_sampling,
+        'effective_samples': None,
+        'effective_samples_source': None,
+        'peak_memory_mb': None,
+        'peak_memory_source': None,
+        'start': time.perf_counter(),
+    }
+
+
+@persistent
+def telemetry_render_stats(stats, *args):
+    """Tracks peak memory and the sample count reached from Blender's render status line"""
+    record = _telemetry['frame']
+    if record is None:
+        return
+
+    for value, unit in PEAK_MEMORY_PATTERN.findall(stats):
+        peak = float(value) * (1024 if unit == 'G' else 1)
+        record['peak_memory_mb'] = max(record['peak_memory_mb'] or 0.0, peak)
+        record['peak_memory_source'] = SOURCE_STATS
+
+    samples = SAMPLE_PATTERN.findall(stats)
+    if samples:
+        record['effective_samples'] = int(samples[-1][0])
+        record['effective_samples_source'] = SOURCE_STATS
+
+
+@persistent
+def telemetry_render_post(scene, *args):
+    """Finishes the frame record and appends it to the telemetry file"""
+    record = _telemetry['frame']
+    if record is None:
+        return
+    _telemetry['frame'] = None
+
+    record['wall_seconds'] = time.perf_counter() - record.pop('start')
+    # render_stats only fires in background renders, UI renders fall back on what is known without it
+    if record['peak_memory_mb'] is None:
+        record['peak_memory_mb'] = peak_process_memory_mb()
+        record['peak_memory_source'] = SOURCE_PROCESS
+    if record['effective_samples'] is None:
+        record['effective_samples'] = record['samples']
+        record['effective_samples_source'] = SOURCE_CONFIGURED
+
+    with open(_telemetry['path'], 'a') as file:
+        file.write(json.dumps(record) + "\n")
+
+
+TELEMETRY_HANDLERS = (
+    (bpy.app.handlers.render_pre, telemetry_render_pre),
+    (bpy.app.handlers.render_stats, telemetry_render_stats),
+    (bpy.app.handlers.render_post, telemetry_render_post),
+)
+
+
+def register(path=None, label=None):
+    """Starts a telemetry run that streams one JSON line per rendered frame"""
+    unregister()
+    _telemetry['path'] = path or default_telemetry_path()
+    _telemetry['run'] = time.strftime("%Y%m%d-%H%M%S")
+    _telemetry['label'] = label
+    for handlers, handler in TELEMETRY_HANDLERS:
+        handlers.append(handler)
+    print(f"Render telemetry run {_telemetry['run']} writing to {_telemetry['path']}")
+    if not bpy.app.background:
+        print("Warning: Blender only reports render stats in background renders, this run records configured "
+              "samples and the process-lifetime memory peak")
+
+
+def unregister():
+    for handlers, handler in TELEMETRY_HANDLERS:
+        for registered in list(handlers):
+            if getattr(registered, '__name__', None) == handler.__name__:
+                handlers.remove(registered)
+
+
+def main():
+    print("Registering render telemetry...")
+    register()
+
+
+if __name__ == "__main__":
+    main()
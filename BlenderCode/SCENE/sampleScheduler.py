@@ -0,0 +1,259 @@
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+
+import bpy
+import numpy as np
+from bpy_extras.object_utils import world_to_camera_view
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from cameraAnimations import get_shot_ranges
+from renderCostEstimator import is_material_transmissive
+
+SAMPLE_BUCKETS = (32, 64, 128, 256, 512, 1024)
+
+# Probe renders: low samples at a fraction of the resolution, twice with different seeds
+PROBE_SAMPLES = 16
+PROBE_RESOLUTION = 25
+
+# Share of the pixels whose noise has to reach the target; the rest, like fireflies, are left to the threshold
+NOISE_PERCENTILE = 90
+
+
+def is_in_view(scene, camera, obj, margin=0.1):
+    """Returns True if the object's origin projects inside the camera frame (with a margin)"""
+    x, y, z = world_to_camera_view(scene, camera, obj.matrix_world.translation)
+    return z > 0.0 and -margin <= x <= 1.0 + margin and -margin <= y <= 1.0 + margin
+
+
+def estimate_frame_complexity(scene, camera, transmissive_weight=2.0, light_weight=0.5):
+    """Estimates frame complexity from the objects in view and the lights affecting them"""
+    complexity = 1.0
+    for obj in scene.objects:
+        if obj.hide_render or not obj.visible_get():
+            continue
+        if obj.type == 'LIGHT':
+            complexity += light_weight
+        elif obj.type == 'MESH' and is_in_view(scene, camera, obj):
+            materials = [slot.material for slot in obj.material_slots]
+            complexity += transmissive_weight if any(is_material_transmissive(m) for m in materials) else 1.0
+    return complexity
+
+
+def read_pixels(path):
+    """Reads the RGB pixels of a rendered image file as an (N, 3) array"""
+    image = bpy.data.images.load(path)
+    try:
+        pixels = np.empty(len(image.pixels), dtype=np.float32)
+        image.pixels.foreach_get(pixels)
+    finally:
+        bpy.data.images.remove(image)
+    return pixels.reshape(-1, 4)[:, :3]
+
+
+def probe_noise_variance(scene, probe_samples=PROBE_SAMPLES, probe_resolution=PROBE_RESOLUTION):
+    """Measures the per-sample noise variance of the current frame from two tiny probe renders.
+
+    The renders differ only in their seed, so their difference is pure noise. Noise is measured relative to the
+    square root of the brightness, as Cycles' adaptive sampling measures it, which makes the result comparable
+    to cycles.adaptive_threshold. Timing the probes instead would mostly measure scene sync and BVH build.
+    """
+    cycles = scene.cycles
+    render = scene.render
+    saved = [(struct, attribute, getattr(struct, attribute)) for struct, attribute in (
+        (cycles, 'samples'), (cycles, 'seed'), (cycles, 'use_animated_seed'), (cycles, 'use_adaptive_sampling'),
+        (cycles, 'use_denoising'), (render, 'resolution_percentage'), (render, 'filepath'),
+        (render.image_settings, 'file_format'), (render.image_settings, 'color_depth'),
+    )]
+    probe_dir = tempfile.mkdtemp(prefix="sample_probe_")
+    try:
+        cycles.samples = probe_samples
+        cycles.use_animated_seed = False
+        cycles.use_adaptive_sampling = False
+        cycles.use_denoising = False
+        render.resolution_percentage = probe_resolution
+        render.image_settings.file_format = 'OPEN_EXR'
+        render.image_settings.color_depth = '32'
+        renders = []
+        for seed in (0, 1):
+            cycles.seed = seed
+            render.filepath = os.path.join(probe_dir, f"probe_{seed}.exr")
+            bpy.ops.render.render(write_still=True)
+            renders.append(read_pixels(render.filepath))
+    finally:
+        for struct, attribute, value in saved:
+            setattr(struct, attribute, value)
+        shutil.rmtree(probe_dir, ignore_errors=True)
+
+    # Each probe's noise is the difference's over sqrt(2), one sample has probe_samples times the variance
+    brightness = np.maximum((renders[0] + renders[1]).sum(axis=1) / 2, 0.0)
+    noise = np.abs(renders[0] - renders[1]).sum(axis=1) / math.sqrt(2) / (1e-4 + np.sqrt(brightness))
+    return float(np.percentile(noise, NOISE_PERCENTILE)) ** 2 * probe_samples
+
+
+def measure_noise_variances(scene, use_probe=False, probe_step=5):
+    """Returns {frame: per-sample noise variance} for the whole frame range.
+
+    Probe mode measures every probe_step-th frame. Otherwise the scene complexity estimate spreads a single
+    probe of the most complex frame over the others, variance growing linearly with complexity.
+    """
+    variances = {}
+    current_frame = scene.frame_current
+    camera = scene.camera
+
+    complexities = {}
+    for name, shot_camera, frame_start, frame_end in get_shot_ranges(scene):
+        step = probe_step if use_probe else 1
+        measured = {}
+        for frame in list(range(frame_start, frame_end + 1, step)) + [frame_end]:
+            if frame in measured:
+                continue
+            scene.frame_set(frame)
+            scene.camera = shot_camera
+            if use_probe:
+                measured[frame] = probe_noise_variance(scene)
+            else:
+                measured[frame] = estimate_frame_complexity(scene, shot_camera)
+                complexities[frame] = (measured[frame], shot_camera)
+
+        # Frames skipped between probes take the worse of their two neighbours
+        probes = sorted(measured)
+        for frame in range(frame_start, frame_end + 1):
+            before = max(p for p in probes if p <= frame)
+            after = min(p for p in probes if p >= frame)
+            variances[frame] = max(measured[before], measured[after])
+
+    if not use_probe:
+        hardest = max(complexities, key=lambda frame: complexities[frame][0])
+        scene.frame_set(hardest)
+        scene.camera = complexities[hardest][1]
+        variance_per_complexity = probe_noise_variance(scene) / complexities[hardest][0]
+        variances = {frame: complexity * variance_per_complexity for frame, complexity in variances.items()}
+
+    scene.camera = camera
+    scene.frame_set(current_frame)
+    return variances
+
+
+def samples_for_variance(variance, noise_target, max_samples, min_samples):
+    """Picks the smallest sample bucket whose noise, sqrt(variance / samples), reaches the target"""
+    needed = max(min_samples, math.ceil(variance / noise_target ** 2))
+    for bucket in SAMPLE_BUCKETS:
+        if bucket >= needed:
+            return min(bucket, max_samples)
+    return max_samples
+
+
+def range_threshold(variance, samples, noise_target):
+    """Adaptive threshold of a range: the target noise, or the noise its capped budget can reach.
+
+    A range that needs more than max_samples would otherwise run every pixel to the cap and end up with uneven
+    noise; stopping at the reachable level spends the budget evenly over the frame.
+    """
+    return max(noise_target, math.sqrt(variance / samples))
+
+
+def build_schedule(scene=None, max_samples=None, min_samples=32, noise_threshold=0.01,
+                   min_range_length=8, use_probe=False):
+    """Groups the frame range into per-shot ranges whose sample budget and threshold reach the noise target"""
+    scene = scene or bpy.context.scene
+    max_samples = max_samples or scene.cycles.samples
+    variances = measure_noise_variances(scene, use_probe=use_probe)
+
+    schedule = []
+    for name, camera, frame_start, frame_end in get_shot_ranges(scene):
+        ranges = []
+        for frame in range(frame_start, frame_end + 1):
+            samples = samples_for_variance(variances[frame], noise_threshold, max_samples, min_samples)
+            if ranges and ranges[-1]['samples'] == samples:
+                ranges[-1]['frame_end'] = frame
+            else:
+                ranges.append({'shot': name, 'camera': camera.name if camera else None,
+                               'frame_start': frame, 'frame_end': frame, 'samples': samples})
+
+        # Fold short ranges into their neighbour, keeping the larger budget
+        merged = []
+        for frame_range in ranges:
+            length = frame_range['frame_end'] - frame_range['frame_start'] + 1
+            if merged and (length < min_range_length or
+                           merged[-1]['frame_end'] - merged[-1]['frame_start'] + 1 < min_range_length):
+                merged[-1]['frame_end'] = frame_range['frame_end']
+                merged[-1]['samples'] = max(merged[-1]['samples'], frame_range['samples'])
+            else:
+                merged.append(frame_range)
+
+        for frame_range in merged:
+            variance = max(variances[frame] for frame in range(frame_range['frame_start'],
+                                                                frame_range['frame_end'] + 1))
+            frame_range['adaptive_threshold'] = range_threshold(variance, frame_range['samples'], noise_threshold)
+            frame_range['adaptive_min_samples'] = max(frame_range['samples'] // 8, 8)
+        schedule.extend(merged)
+
+    return schedule
+
+
+def save_schedule(schedule, path):
+    """Writes the schedule as JSON for the render driver"""
+    with open(path, 'w') as file:
+        json.dump(schedule, file, indent=2)
+
+
+def load_schedule(path):
+    """Reads a schedule written by save_schedule"""
+    with open(path, 'r') as file:
+        return json.load(file)
+
+
+def render_schedule(schedule, scene=None):
+    """Renders every scheduled range as an animation with its own sampling settings"""
+    scene = scene or bpy.context.scene
+    cycles = scene.cycles
+    saved = (scene.frame_start, scene.frame_end, cycles.samples, cycles.use_adaptive_sampling,
+             cycles.adaptive_threshold, cycles.adaptive_min_samples)
+    try:
+        for frame_range in schedule:
+            print(f"Rendering {frame_range['shot']} frames {frame_range['frame_start']}-"
+                  f"{frame_range['frame_end']} at {frame_range['samples']} samples")
+            scene.frame_start = frame_range['frame_start']
+            scene.frame_end = frame_range['frame_end']
+            cycles.samples = frame_range['samples']
+            cycles.use_adaptive_sampling = True
+            cycles.adaptive_threshold = frame_range['adaptive_threshold']
+            cycles.adaptive_min_samples = frame_range['adaptive_min_samples']
+            bpy.ops.render.render(animation=True)
+    finally:
+        (scene.frame_start, scene.frame_end, cycles.samples, cycles.use_adaptive_sampling,
+         cycles.adaptive_threshold, cycles.adaptive_min_samples) = saved
+
+
+def print_schedule(schedule, frame_count):
+    """Prints the schedule and the sample budget it saves over a fixed sample count"""
+    for frame_range in schedule:
+        print(f"{frame_range['shot']:>16}: frames {frame_range['frame_start']:>3}-{frame_range['frame_end']:<3} "
+              f"samples {frame_range['samples']:>4}, threshold {frame_range['adaptive_threshold']:.4f}")
+    scheduled = sum((r['frame_end'] - r['frame_start'] + 1) * r['samples'] for r in schedule)
+    fixed = frame_count * max(r['samples'] for r in schedule)
+    print(f"Scheduled sample budget: {scheduled:,} ({scheduled / fixed:.0%} of a fixed budget)")
+
+
+def main():
+    print("Building per-shot sample schedule...")
+    scene = bpy.context.scene
+    schedule = build_schedule(scene)
+    print_schedule(schedule, scene.frame_end - scene.frame_start + 1)
+
+    schedule_path = bpy.path.abspath("//sample_schedule.json") if bpy.data.filepath else None
+    if schedule_path:
+        save_schedule(schedule, schedule_path)
+        print(f"Schedule written to {schedule_path}")
+
+    print("Sample scheduling completed.")
+    return schedule
+
+
+if __name__ == "__main__":
+    main()
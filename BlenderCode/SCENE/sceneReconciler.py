@@ -0,0 +1,147 @@
+import os
+import sys
+
+import bpy
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sceneReset import purge_orphans, remove_objects
+
+# Custom property holding the stable key of every object the pipeline owns, e.g. "planet/17" or "light/rim/3"
+PIPELINE_KEY = "pipeline_key"
+PIPELINE_SIGNATURE = "pipeline_signature"
+
+# Scene flag set once the scene has been cleared of objects no stage owns
+PIPELINE_ADOPTED = "pipeline_adopted"
+
+# Key prefixes of the objects each stage owns
+PLANET_KEY_PREFIX = "planet/"
+CAMERA_KEY_PREFIX = "camera/"
+LIGHT_KEY_PREFIX = "light/"
+STARS_KEY_PREFIX = "stars/"
+
+TOLERANCE = 1e-5
+
+
+def pipeline_key(obj):
+    return obj.get(PIPELINE_KEY)
+
+
+def owned_objects(prefix):
+    """Returns {key: object} for every object whose pipeline key starts with prefix"""
+    owned = {}
+    for obj in bpy.data.objects:
+        key = obj.get(PIPELINE_KEY)
+        if isinstance(key, str) and key.startswith(prefix):
+            owned[key] = obj
+    return owned
+
+
+def adopt_scene(scene=None):
+    """On the first reconciled run, removes the objects no stage owns: the startup light and camera, or objects
+    of runs made before pipeline keys existed. Later runs leave objects added by hand alone"""
+    scene = scene or bpy.context.scene
+    if scene.get(PIPELINE_ADOPTED):
+        return 0
+    unowned = [obj for obj in scene.objects if obj.get(PIPELINE_KEY) is None]
+    removed, purged = remove_objects(unowned) if unowned else (0, 0)
+    scene[PIPELINE_ADOPTED] = True
+    print(f"Adopted scene: removed {len(unowned)} objects without a pipeline key ({removed} datablocks)")
+    return len(unowned)
+
+
+def values_differ(current, value):
+    if isinstance(value, (str, bool)) or value is None or current is None or hasattr(value, 'bl_rna'):
+        return current != value
+    return not np.allclose(np.asarray(current, dtype=np.float64), np.asarray(value, dtype=np.float64),
+                           atol=TOLERANCE)
+
+
+def set_properties(datablock, **values):
+    """Assigns only the values that differ, so unchanged data is not tagged for re-evaluation; returns True on change"""
+    changed = False
+    for name, value in values.items():
+        if values_differ(getattr(datablock, name), value):
+            setattr(datablock, name, value)
+            changed = True
+    return changed
+
+
+def set_keyframes(id_data, data_path, frames, values):
+    """Writes one keyframe per frame into the F-curves of a property in bulk; returns True if any curve changed"""
+    frames = np.asarray(frames, dtype=np.float32)
+    values = np.asarray(values, dtype=np.float32).reshape(len(frames), -1)
+
+    animation_data = id_data.animation_data or id_data.animation_data_create()
+    if animation_data.action is None:
+        animation_data.action = bpy.data.actions.new(f"{id_data.name}Action")
+    fcurves = animation_data.action.fcurves
+
+    changed = False
+    for index in range(values.shape[1]):
+        coordinates = np.column_stack([frames, values[:, index]]).ravel()
+        fcurve = fcurves.find(data_path, index=index) or fcurves.new(data_path, index=index)
+        keyframes = fcurve.keyframe_points
+
+        if len(keyframes) == len(frames):
+            current = np.empty(len(coordinates), dtype=np.float32)
+            keyframes.foreach_get("co", current)
+            if np.allclose(current, coordinates, atol=TOLERANCE):
+                continue
+        else:
+            keyframes.clear()
+            keyframes.add(len(frames))
+
+        keyframes.foreach_set("co", coordinates)
+        # Recalculates the automatic handles around the new values
+        fcurve.update()
+        changed = True
+    return changed
+
+
+class SceneReconciler:
+    """Matches the objects a stage declares by pipeline key against the ones left by earlier runs"""
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.existing = owned_objects(prefix)
+        self.declared = set()
+        self.created = set()
+        self.updated = set()
+
+    def ensure(self, key, create, signature=None):
+        """Returns the object owning key, creating it when missing or when its signature changed"""
+        self.declared.add(key)
+        obj = self.existing.get(key)
+
+        # The signature covers what cannot be updated in place, like the topology of a generated mesh
+        if obj is not None and signature is not None and obj.get(PIPELINE_SIGNATURE) != repr(signature):
+            remove_objects([obj], purge=False)
+            obj = None
+
+        if obj is None:
+            obj = create()
+            obj[PIPELINE_KEY] = key
+            if signature is not None:
+                obj[PIPELINE_SIGNATURE] = repr(signature)
+            self.existing[key] = obj
+            self.created.add(key)
+        return obj
+
+    def mark_updated(self, key, changed=True):
+        if changed and key not in self.created:
+            self.updated.add(key)
+        return changed
+
+    def remove_stale(self):
+        """Removes the owned objects no longer declared, then purges the data they and replaced objects left"""
+        stale = [obj for key, obj in self.existing.items() if key not in self.declared]
+        if stale:
+            remove_objects(stale, purge=False)
+        purge_orphans()
+
+        unchanged = len(self.declared) - len(self.created) - len(self.updated)
+        print(f"Reconciled {self.prefix}*: {len(self.created)} created, {len(self.updated)} updated, "
+              f"{unchanged} unchanged, {len(stale)} removed")
+        return stale
@@ -0,0 +1,109 @@
+import bpy
+
+# Rough per-element sizes used to turn datablock contents into a memory estimate
+MESH_ELEMENT_BYTES = {'vertices': 32, 'edges': 16, 'loops': 24, 'polygons': 24}
+KEYFRAME_BYTES = 64
+NODE_BYTES = 1024
+DATABLOCK_BYTES = 2048
+
+ACCOUNTED_TYPES = ('objects', 'meshes', 'materials', 'node_groups', 'images', 'actions', 'lights', 'cameras',
+                   'worlds', 'collections')
+
+
+def get_animation_actions(id_data):
+    """Returns the action assigned to a datablock, as a list"""
+    animation_data = getattr(id_data, 'animation_data', None)
+    if animation_data and animation_data.action:
+        return [animation_data.action]
+    return []
+
+
+def collect_object_datablocks(objects):
+    """Returns the objects plus the data and actions that only these objects use"""
+    objects = set(objects)
+    datablocks = set(objects)
+
+    data_users = {}
+    for obj in objects:
+        datablocks.update(get_animation_actions(obj))
+        if obj.data is not None:
+            data_users[obj.data] = data_users.get(obj.data, 0) + 1
+
+    for data, users in data_users.items():
+        # Shared data that other objects still reference must survive
+        if data.users <= users:
+            datablocks.add(data)
+            datablocks.update(get_animation_actions(data))
+
+    return datablocks
+
+
+def purge_orphans():
+    """Removes every datablock left without users, following dependencies recursively"""
+    total = 0
+    while True:
+        removed = bpy.data.orphans_purge(do_local_ids=True, do_linked_ids=True, do_recursive=True)
+        if not removed:
+            return total
+        total += removed
+
+
+def remove_objects(objects, purge=True):
+    """Removes objects together with their exclusive data and actions in a single batch"""
+    datablocks = collect_object_datablocks(objects)
+    if datablocks:
+        bpy.data.batch_remove(datablocks)
+    purged = purge_orphans() if purge else 0
+    return len(datablocks), purged
+
+
+def estimate_datablock_bytes(collection_name, datablock):
+    """Estimates the memory held by one datablock"""
+    size = DATABLOCK_BYTES
+    if collection_name == 'meshes':
+        size += sum(len(getattr(datablock, element)) * element_bytes
+                    for element, element_bytes in MESH_ELEMENT_BYTES.items())
+    elif collection_name in ('materials', 'worlds') and datablock.node_tree:
+        size += len(datablock.node_tree.nodes) * NODE_BYTES
+    elif collection_name == 'node_groups':
+        size += len(datablock.nodes) * NODE_BYTES
+    elif collection_name == 'images' and datablock.has_data:
+        bytes_per_channel = 4 if datablock.is_float else 1
+        size += datablock.size[0] * datablock.size[1] * datablock.channels * bytes_per_channel
+    elif collection_name == 'actions':
+        size += sum(len(fcurve.keyframe_points) for fcurve in datablock.fcurves) * KEYFRAME_BYTES
+    return size
+
+
+def memory_account():
+    """Returns {datablock type: (count, estimated bytes)} for the current blend data"""
+    account = {}
+    for collection_name in ACCOUNTED_TYPES:
+        collection = getattr(bpy.data, collection_name)
+        account[collection_name] = (
+            len(collection),
+            sum(estimate_datablock_bytes(collection_name, datablock) for datablock in collection)
+        )
+    return account
+
+
+def print_memory_account(account, stage_peaks=None):
+    """Prints datablock counts and sizes, plus the Python allocation peak of each stage"""
+    print("Memory account:")
+    for collection_name, (count, size) in account.items():
+        print(f"  {collection_name:>12}: {count:>6} datablocks, ~{size / (1024 * 1024):8.2f} MB")
+    total = sum(size for count, size in account.values())
+    print(f"  {'total':>12}: ~{total / (1024 * 1024):.2f} MB")
+
+    for stage, peak in (stage_peaks or {}).items():
+        print(f"  Python peak during {stage}: {peak / (1024 * 1024):.2f} MB")
+
+
+def main():
+    print("Purging orphan datablocks...")
+    print(f"Purged {purge_orphans()} orphans")
+    print_memory_account(memory_account())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,15 @@
-import bpy
 import math
+import os
+import sys
+
+import bpy
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sceneReconciler import STARS_KEY_PREFIX, SceneReconciler, set_properties
+
+# Emission, Voronoi, Color Ramp and Output node names of the star materials
+STAR_NODE_NAMES = ("Star Emission", "Star Voronoi", "Star Ramp", "Star Output")
 
 def create_milky_way_core():
     world = bpy.context.scene.world
@@ -21,39 +31,75 @@ def create_milky_way_core():
     links.new(background.outputs['Background'], output.inputs['Surface'])
 
 
-def create_dense_starfield():
-    for i in range(3):
-        bpy.ops.mesh.primitive_uv_sphere_add(radius=150 + i * 20)
-        stars = bpy.context.active_object
-        stars.name = f'Deep_Space_Stars_{i}'
+def create_star_shell(index, radius):
+    """Creates one emissive starfield shell around the scene"""
+    bpy.ops.mesh.primitive_uv_sphere_add(radius=radius)
+    stars = bpy.context.active_object
+    stars.name = f'Deep_Space_Stars_{index}'
+
+    # A re-created shell reuses the star material of an earlier run
+    mat = bpy.data.materials.get(f"Star_Field_{index}")
+    if mat is None:
+        mat = create_star_material(index)
+    stars.data.materials.append(mat)
+    return stars
 
-        mat = bpy.data.materials.new(name=f"Star_Field_{i}")
-        mat.use_nodes = True
-        nodes = mat.node_tree.nodes
-        links = mat.node_tree.links
-        nodes.clear()
 
-        emission = nodes.new('ShaderNodeEmission')
-        voronoi = nodes.new('ShaderNodeTexVoronoi')
-        color_ramp = nodes.new('ShaderNodeValToRGB')
-        output = nodes.new('ShaderNodeOutputMaterial')
+def create_star_material(i):
+    mat = bpy.data.materials.new(name=f"Star_Field_{i}")
+    mat.use_nodes = True
+    build_star_nodes(mat)
+    update_star_material(mat, i)
+    return mat
 
-        # Ultra-fine star settings
-        voronoi.inputs['Scale'].default_value = 3000.0 + i * 500
 
-        # Extreme contrast for stars
-        color_ramp.color_ramp.elements[0].position = 0.999
-        color_ramp.color_ramp.elements[0].color = (0, 0, 0, 1)
-        color_ramp.color_ramp.elements[1].position = 1.0
-        color_ramp.color_ramp.elements[1].color = (0.2, 0.2, 0.3, 1)
+def build_star_nodes(mat):
+    """Creates the star node layout, update_star_material sets its values"""
+    nodes = mat.node_tree.nodes
+    links = mat.node_tree.links
+    nodes.clear()
+
+    emission = nodes.new('ShaderNodeEmission')
+    voronoi = nodes.new('ShaderNodeTexVoronoi')
+    color_ramp = nodes.new('ShaderNodeValToRGB')
+    output = nodes.new('ShaderNodeOutputMaterial')
+    for node, name in zip((emission, voronoi, color_ramp, output), STAR_NODE_NAMES):
+        node.name = name
+
+    links.new(voronoi.outputs['Distance'], color_ramp.inputs['Fac'])
+    links.new(color_ramp.outputs['Color'], emission.inputs['Color'])
+    links.new(emission.outputs['Emission'], output.inputs['Surface'])
+
+
+def update_star_material(mat, i):
+    """Sets the star values in place, so edits apply without recompiling unchanged shells; returns True on change"""
+    nodes = mat.node_tree.nodes
+    if not all(name in nodes for name in STAR_NODE_NAMES):
+        build_star_nodes(mat)
+    emission, voronoi, color_ramp, output = (nodes[name] for name in STAR_NODE_NAMES)
 
-        emission.inputs['Strength'].default_value = 2.0 - (i * 0.5)
+    # Ultra-fine star settings
+    changed = set_properties(voronoi.inputs['Scale'], default_value=3000.0 + i * 500)
 
-        links.new(voronoi.outputs['Distance'], color_ramp.inputs['Fac'])
-        links.new(color_ramp.outputs['Color'], emission.inputs['Color'])
-        links.new(emission.outputs['Emission'], output.inputs['Surface'])
+    # Extreme contrast for stars
+    elements = color_ramp.color_ramp.elements
+    changed |= set_properties(elements[0], position=0.999, color=(0, 0, 0, 1))
+    changed |= set_properties(elements[1], position=1.0, color=(0.2, 0.2, 0.3, 1))
 
-        stars.data.materials.append(mat)
+    changed |= set_properties(emission.inputs['Strength'], default_value=2.0 - (i * 0.5))
+    return changed
+
+
+def create_dense_starfield():
+    # Shells of an earlier run are kept, only missing or resized ones are rebuilt
+    reconciler = SceneReconciler(STARS_KEY_PREFIX)
+    for i in range(3):
+        radius = 150 + i * 20
+        key = f"{STARS_KEY_PREFIX}{i}"
+        stars = reconciler.ensure(key, lambda: create_star_shell(i, radius), signature=radius)
+        if stars.data.materials and stars.data.materials[0] is not None:
+            reconciler.mark_updated(key, update_star_material(stars.data.materials[0], i))
+    reconciler.remove_stale()
 
 
 def setup_camera_view():
@@ -0,0 +1,106 @@
+import argparse
+import json
+from statistics import mean
+
+# Source renderTelemetry records for values read from Blender's render stats; others are fallbacks
+SOURCE_STATS = "stats"
+
+
+def load_run(path, run=None):
+    """Loads the frame records of one run from a telemetry file, the last run by default"""
+    with open(path, 'r') as file:
+        records = [json.loads(line) for line in file if line.strip()]
+    if not records:
+        return []
+    run = run or records[-1]['run']
+    return [record for record in records if record['run'] == run]
+
+
+def summarize_shots(records):
+    """Groups frame records by shot and averages their cost"""
+    shots = {}
+    for record in records:
+        shots.setdefault(record['shot'], []).append(record)
+
+    summary = {}
+    for shot, frames in shots.items():
+        # The fallback peak is the process high-water mark, which cannot show a shot's own memory
+        measured_memory = all(frame.get('peak_memory_source') == SOURCE_STATS for frame in frames)
+        peaks = [frame['peak_memory_mb'] for frame in frames if frame['peak_memory_mb'] is not None]
+        summary[shot] = {
+            'frames': len(frames),
+            'first_frame': min(frame['frame'] for frame in frames),
+            'wall_seconds': mean(frame['wall_seconds'] for frame in frames),
+            'peak_memory_mb': max(peaks) if peaks and measured_memory else None,
+            'visible_objects': mean(frame['visible_objects'] for frame in frames),
+            'visible_lights': mean(frame['visible_lights'] for frame in frames),
+            'effective_samples': mean(frame['effective_samples'] for frame in frames),
+            'samples_measured': all(frame.get('effective_samples_source') == SOURCE_STATS for frame in frames),
+        }
+    return summary
+
+
+def compare_runs(baseline, candidate, threshold=0.1):
+    """Compares two runs shot by shot and flags shots that got slower or hungrier than the threshold"""
+    baseline_shots = summarize_shots(baseline)
+    candidate_shots = summarize_shots(candidate)
+
+    comparison = []
+    for shot in sorted(set(baseline_shots) & set(candidate_shots), key=lambda s: candidate_shots[s]['first_frame']):
+        before = baseline_shots[shot]
+        after = candidate_shots[shot]
+        time_ratio = after['wall_seconds'] / before['wall_seconds'] if before['wall_seconds'] else float('inf')
+        memory_ratio = None
+        if before['peak_memory_mb'] and after['peak_memory_mb'] is not None:
+            memory_ratio = after['peak_memory_mb'] / before['peak_memory_mb']
+        comparison.append({
+            'shot': shot,
+            'baseline': before,
+            'candidate': after,
+            'time_ratio': time_ratio,
+            'memory_ratio': memory_ratio,
+            'regression': time_ratio > 1 + threshold or (memory_ratio is not None and memory_ratio > 1 + threshold),
+        })
+    return comparison
+
+
+def print_comparison(comparison):
+    """Prints a per-shot table and the regressions found"""
+    print(f"{'shot':>16} {'frames':>6} {'base s':>8} {'new s':>8} {'time':>7} {'memory':>7}  changes")
+    for entry in comparison:
+        before = entry['baseline']
+        after = entry['candidate']
+        changes = []
+        measured = before['samples_measured'] and after['samples_measured']
+        for key, name in (('visible_objects', 'objects'), ('visible_lights', 'lights'),
+                          ('effective_samples', 'samples' if measured else 'configured samples')):
+            if round(before[key], 1) != round(after[key], 1):
+                changes.append(f"{name} {before[key]:.0f}->{after[key]:.0f}")
+        memory = f"{entry['memory_ratio']:6.2f}x" if entry['memory_ratio'] is not None else "    n/a"
+        flag = "  REGRESSION" if entry['regression'] else ""
+        print(f"{entry['shot']:>16} {after['frames']:>6} {before['wall_seconds']:8.2f} {after['wall_seconds']:8.2f} "
+              f"{entry['time_ratio']:6.2f}x {memory}  {', '.join(changes)}{flag}")
+
+    if any(entry['memory_ratio'] is None for entry in comparison):
+        print("Memory is n/a where a run has no per-frame peak from Blender's render stats (UI renders)")
+    regressions = [entry['shot'] for entry in comparison if entry['regression']]
+    print(f"Regressed shots: {', '.join(regressions) if regressions else 'none'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two render telemetry runs shot by shot.")
+    parser.add_argument('baseline', help="telemetry JSONL of the reference run")
+    parser.add_argument('candidate', help="telemetry JSONL of the run to check")
+    parser.add_argument('--baseline-run', help="run id inside the baseline file (default: last run)")
+    parser.add_argument('--candidate-run', help="run id inside the candidate file (default: last run)")
+    parser.add_argument('--threshold', type=float, default=0.1, help="relative slowdown that counts as a regression")
+    args = parser.parse_args()
+
+    comparison = compare_runs(load_run(args.baseline, args.baseline_run),
+                              load_run(args.candidate, args.candidate_run), args.threshold)
+    print_comparison(comparison)
+    return comparison
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+import os
+import sys
+import tempfile
+import time
+
+import bpy
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from planetSwarm import SWARM_OBJECT_NAME, WORM_FRAMES, store_trajectories, worm_state
+
+# Large primes for hashing integer cell coordinates when the grid is too large to index linearly
+HASH_PRIMES = np.array([73856093, 19349663, 83492791], dtype=np.int64)
+MAX_LINEAR_CELLS = 2 ** 62
+
+# The cell itself plus the 13 neighbours that come after it, so every cell pair is visited once
+HALF_NEIGHBOURHOOD = np.array(
+    [(0, 0, 0)] + [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)
+                   if (dx, dy, dz) > (0, 0, 0)],
+    dtype=np.int64
+)
+
+
+def hash_cells(cells):
+    """Hashes (N, 3) integer cell coordinates into (N,) keys"""
+    return np.bitwise_xor.reduce(cells * HASH_PRIMES, axis=1)
+
+
+def find_contacts(positions, radii, cell_size=None):
+    """Returns the (i, j) index arrays, i < j, of every pair of spheres that overlap in one frame"""
+    count = len(positions)
+    if count < 2:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+
+    # Cells as wide as the largest contact distance keep every contact within neighbouring cells
+    cell_size = cell_size or 2.0 * float(radii.max())
+    cells = np.floor(positions / cell_size).astype(np.int64)
+
+    # A one-cell border keeps neighbour offsets from wrapping around the linear index
+    cells -= cells.min(axis=0) - 1
+    dims = cells.max(axis=0) + 2
+    linear = int(dims[0]) * int(dims[1]) * int(dims[2]) < MAX_LINEAR_CELLS
+    keys = (cells[:, 0] * dims[1] + cells[:, 1]) * dims[2] + cells[:, 2] if linear else hash_cells(cells)
+
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    sorted_cells = cells[order]
+
+    pairs_i = []
+    pairs_j = []
+    for offset in HALF_NEIGHBOURHOOD:
+        # Linear keys shift by a constant, so the queries stay sorted and the searches stay cache friendly
+        if linear:
+            neighbour_keys = sorted_keys + (offset[0] * dims[1] + offset[1]) * dims[2] + offset[2]
+        else:
+            neighbour_keys = hash_cells(sorted_cells + offset)
+        starts = np.searchsorted(sorted_keys, neighbour_keys, side='left')
+        counts = np.searchsorted(sorted_keys, neighbour_keys, side='right') - starts
+        total = int(counts.sum())
+        if total == 0:
+            continue
+
+        # Expand every [start, start + count) range into flat candidate indices
+        first = np.repeat(np.cumsum(counts) - counts, counts)
+        candidates_i = np.repeat(order, counts)
+        candidates_j = order[np.repeat(starts, counts) + np.arange(total) - first]
+
+        keep = candidates_i != candidates_j
+        candidates_i = candidates_i[keep]
+        candidates_j = candidates_j[keep]
+        delta = positions[candidates_j] - positions[candidates_i]
+        reach = radii[candidates_i] + radii[candidates_j]
+        touching = np.einsum('ij,ij->i', delta, delta) < reach * reach
+        pairs_i.append(candidates_i[touching])
+        pairs_j.append(candidates_j[touching])
+
+    if not pairs_i:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+
+    # Hash collisions and the self cell can report a pair twice, so normalise and deduplicate
+    pairs_i = np.concatenate(pairs_i)
+    pairs_j = np.concatenate(pairs_j)
+    low = np.minimum(pairs_i, pairs_j)
+    high = np.maximum(pairs_i, pairs_j)
+    unique = np.unique(low * count + high)
+    return unique // count, unique % count
+
+
+def count_contacts(positions, radii):
+    """Counts overlapping pairs summed over all frames of (N, F, 3) positions and (N, F) radii"""
+    return sum(len(find_contacts(positions[:, frame], radii[:, frame])[0]) for frame in range(positions.shape[1]))
+
+
+def smooth_along_frames(values, window):
+    """Box-filters (N, F, ...) values along the frame axis twice, which approximates a gaussian"""
+    if window <= 1:
+        return values
+    half = window // 2
+    for _ in range(2):
+        padded = np.concatenate([np.repeat(values[:, :1], half, axis=1), values,
+                                 np.repeat(values[:, -1:], half, axis=1)], axis=1)
+        cumulative = np.cumsum(padded, axis=1)
+        cumulative = np.concatenate([np.zeros_like(cumulative[:, :1]), cumulative], axis=1)
+        values = (cumulative[:, 2 * half + 1:] - cumulative[:, :-2 * half - 1]) / (2 * half + 1)
+    return values
+
+
+def resolve_overlaps(positions, radii, iterations=10, smoothing=9, margin=0.02, shrink_remaining=False):
+    """Pushes overlapping spheres apart with smooth offsets and reports the contacts left over"""
+    positions = np.asarray(positions, dtype=np.float64)
+    radii = np.asarray(radii, dtype=np.float64)
+    if radii.ndim == 1:
+        radii = np.repeat(radii[:, None], positions.shape[1], axis=1)
+    count, frames = positions.shape[:2]
+    padded_radii = radii * (1.0 + margin)
+
+    start = time.perf_counter()
+    contacts_before = count_contacts(positions, radii)
+    offsets = np.zeros_like(positions)
+
+    for iteration in range(iterations):
+        current = positions + offsets
+        push = np.zeros_like(positions)
+        contacts = 0
+
+        for frame in range(frames):
+            i, j = find_contacts(current[:, frame], padded_radii[:, frame])
+            if len(i) == 0:
+                continue
+            contacts += len(i)
+
+            delta = current[j, frame] - current[i, frame]
+            distance = np.linalg.norm(delta, axis=1)
+            # Coincident centres get pushed apart vertically
+            normal = np.where(distance[:, None] > 1e-9, delta / np.maximum(distance, 1e-9)[:, None], (0.0, 0.0, 1.0))
+            overlap = padded_radii[i, frame] + padded_radii[j, frame] - distance
+            move = normal * (0.5 * overlap)[:, None]
+            np.add.at(push[:, frame], i, -move)
+            np.add.at(push[:, frame], j, move)
+
+        if contacts == 0:
+            break
+        # Smoothing spreads each correction over neighbouring frames so the motion stays continuous
+        offsets += smooth_along_frames(push, smoothing)
+
+    resolved = positions + offsets
+    radius_scale = np.ones(count)
+    if shrink_remaining:
+        # Whatever the offsets could not separate is fixed by shrinking both spheres just enough
+        for frame in range(frames):
+            i, j = find_contacts(resolved[:, frame], radii[:, frame] * radius_scale)
+            if len(i) == 0:
+                continue
+            distance = np.linalg.norm(resolved[j, frame] - resolved[i, frame], axis=1)
+            # Slightly under the exact fit, so rounding cannot leave the pair touching
+            fit = distance / (radii[i, frame] + radii[j, frame]) * (1.0 - 1e-6)
+            np.minimum.at(radius_scale, i, fit)
+            np.minimum.at(radius_scale, j, fit)
+
+    contacts_after = count_contacts(resolved, radii * radius_scale[:, None])
+    return {
+        'positions': resolved,
+        'radius_scale': radius_scale,
+        'contacts_before': contacts_before,
+        'contacts_after': contacts_after,
+        'max_offset': float(np.linalg.norm(offsets, axis=2).max()) if offsets.size else 0.0,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def print_resolution_report(result):
+    """Prints contact counts before and after the resolve"""
+    print(f"Contacts (pair-frames): {result['contacts_before']} before, {result['contacts_after']} after")
+    print(f"Largest offset: {result['max_offset']:.3f}, spheres shrunk: {int((result['radius_scale'] < 1).sum())}, "
+          f"time: {result['seconds']:.1f}s")
+    if result['contacts_after']:
+        print(f"Warning: {result['contacts_after']} overlapping pair-frames remain")
+
+
+def sample_sphere_trajectories(spheres, frame_start, frame_end):
+    """Samples (N, F, 3) positions and (N, F) radii from the spheres' location and scale curves"""
+    frames = range(frame_start, frame_end + 1)
+    positions = np.zeros((len(spheres), len(frames), 3))
+    radii = np.zeros((len(spheres), len(frames)))
+
+    for index, sphere in enumerate(spheres):
+        coordinates = np.empty(len(sphere.data.vertices) * 3)
+        sphere.data.vertices.foreach_get("co", coordinates)
+        base_radius = np.linalg.norm(coordinates.reshape(-1, 3), axis=1).max()
+
+        curves = {}
+        if sphere.animation_data and sphere.animation_data.action:
+            for fcurve in sphere.animation_data.action.fcurves:
+                curves[(fcurve.data_path, fcurve.array_index)] = fcurve
+
+        for axis in range(3):
+            fcurve = curves.get(("location", axis))
+            positions[index, :, axis] = ([fcurve.evaluate(frame) for frame in frames] if fcurve
+                                         else sphere.location[axis])
+        scale_curve = curves.get(("scale", 0))
+        scales = np.array([scale_curve.evaluate(frame) for frame in frames]) if scale_curve else sphere.scale[0]
+        radii[index] = base_radius * np.abs(scales)
+
+    return positions, radii
+
+
+def scale_keyframes(fcurve, factor):
+    """Multiplies the values and handles of an F-curve's keyframes by factor"""
+    keyframes = fcurve.keyframe_points
+    values = np.empty(len(keyframes) * 2)
+    for attribute in ("co", "handle_left", "handle_right"):
+        keyframes.foreach_get(attribute, values)
+        values.reshape(-1, 2)[:, 1] *= factor
+        keyframes.foreach_set(attribute, values)
+    fcurve.update()
+
+
+def apply_sphere_trajectories(spheres, positions, frame_start, radius_scale=None):
+    """Writes resolved positions into the spheres' location keyframes and shrunk fits into their scale"""
+    for index, sphere in enumerate(spheres):
+        if not (sphere.animation_data and sphere.animation_data.action):
+            continue
+        for fcurve in sphere.animation_data.action.fcurves:
+            if fcurve.data_path != "location":
+                continue
+            keyframes = fcurve.keyframe_points
+            coordinates = np.empty(len(keyframes) * 2)
+            keyframes.foreach_get("co", coordinates)
+            coordinates = coordinates.reshape(-1, 2)
+
+            frame_indices = np.clip(np.rint(coordinates[:, 0]).astype(int) - frame_start, 0, positions.shape[1] - 1)
+            shift = positions[index, frame_indices, fcurve.array_index] - coordinates[:, 1]
+            coordinates[:, 1] += shift
+            keyframes.foreach_set("co", coordinates.ravel())
+
+            handles = np.empty(len(keyframes) * 2)
+            for handle in ("handle_left", "handle_right"):
+                keyframes.foreach_get(handle, handles)
+                handles.reshape(-1, 2)[:, 1] += shift
+                keyframes.foreach_set(handle, handles)
+            fcurve.update()
+
+        # The fit goes on the object scale, which the pipeline rewrites on a re-run together with the location keys;
+        # the mesh keeps the radius its signature records
+        if radius_scale is not None and radius_scale[index] < 1.0:
+            scale_curves = [fcurve for fcurve in sphere.animation_data.action.fcurves if fcurve.data_path == "scale"]
+            for fcurve in scale_curves:
+                scale_keyframes(fcurve, radius_scale[index])
+            if not scale_curves:
+                sphere.scale *= radius_scale[index]
+
+
+def main():
+    print("Resolving planet overlaps...")
+    scene = bpy.context.scene
+    swarm = bpy.data.objects.get(SWARM_OBJECT_NAME)
+
+    if swarm is not None:
+        mesh = swarm.data
+        delays = np.empty(len(mesh.vertices), dtype=np.float32)
+        radii = np.empty(len(mesh.vertices), dtype=np.float32)
+        mesh.attributes["delay"].data.foreach_get("value", delays)
+        mesh.attributes["radius"].data.foreach_get("value", radii)
+
+        states = [worm_state(delays, frame) for frame in range(WORM_FRAMES)]
+        positions = np.stack([state[0] for state in states], axis=1)
+        scales = np.abs(np.stack([state[2] for state in states], axis=1))
+
+        # Swarm planets follow each other closely along one path, a packed chain that offsets alone only half
+        # separate, so the spheres still touching are shrunk as well
+        result = resolve_overlaps(positions, radii[:, None] * scales, shrink_remaining=True)
+        # The fit is kept apart from the radius, so resolving again starts from the planets' own sizes
+        mesh.attributes["radius_fit"].data.foreach_set("value", result['radius_scale'].astype(np.float32))
+        mesh.update()
+        cache_dir = bpy.path.abspath("//") if bpy.data.filepath else tempfile.gettempdir()
+        store_trajectories(swarm, result['positions'], os.path.join(cache_dir, "planet_swarm_trajectories.npy"))
+    else:
+        spheres = [obj for obj in scene.objects if obj.type == 'MESH' and "Sphere" in obj.name]
+        positions, radii = sample_sphere_trajectories(spheres, scene.frame_start, scene.frame_end)
+        result = resolve_overlaps(positions, radii, shrink_remaining=True)
+        apply_sphere_trajectories(spheres, result['positions'], scene.frame_start, result['radius_scale'])
+
+    print_resolution_report(result)
+    print("Overlap resolution completed.")
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,14 @@ base_dir = Path("C:/3D_Planets_python_scripts/BlenderCode/SCENE")  # Update this
 
 sys.path.append(blender_python_path)
 
+def load_module(script_name):
+    """Loads a script from base_dir as a module"""
+    module_name = script_name[:-3]  # Remove the '.py' extension
+    spec = importlib.util.spec_from_file_location(module_name, str(base_dir / script_name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
 def execute_mains():
     # Order of execution for your script files
     files_to_execute = [
@@ -15,7 +23,8 @@ def execute_mains():
         'cameraAnimations.py',
         'cityLighting.py',
         'spaceEnvironnement.py',
-        'organizeHierarchie.py'
+        'organizeHierarchie.py',
+        'renderCostEstimator.py'
     ]
 
     # Ensure the base directory exists
@@ -24,6 +33,10 @@ def execute_mains():
         print(f"Error: The directory {base_dir} does not exist.")
         return  # Stop execution if the directory is invalid
 
+    builder_module = load_module('incrementalBuilder.py')
+    scene_reset = load_module('sceneReset.py')
+
+    stages = []
     for script_name in files_to_execute:
         # Construct the full file path correctly
         script_path = base_dir / script_name
@@ -33,20 +46,24 @@ def execute_mains():
             continue  # Skip to the next script if the current one doesn't exist
 
         print(f'Loading {script_name}')
-        module_name = script_name[:-3]  # Remove the '.py' extension
-        spec = importlib.util.spec_from_file_location(module_name, str(script_path))
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
-
-        # Execute main() from the loaded script if available
-        try:
-            if hasattr(module, 'main'):
-                print(f'Executing main() from {script_name}')
-                module.main()
-            else:
-                print(f"Warning: {script_name} does not have a main() function.")
-        except Exception as e:
-            print(f"Error executing {script_name}: {str(e)}")
+        module = load_module(script_name)
+
+        # Queue build_steps() (or main() as a single unit) from the loaded script if available
+        if hasattr(module, 'build_steps') or hasattr(module, 'main'):
+            stages.append((script_name[:-3], builder_module.stage_steps(module)))
+        else:
+            print(f"Warning: {script_name} does not have a main() function.")
+
+    def report_memory(builder):
+        # Report what this run (finished or cancelled) left in bpy.data
+        scene_reset.print_memory_account(scene_reset.memory_account(), builder.stage_peaks)
+
+    # Runs on timers with a responsive UI, or straight through with --background,
+    # tracking the Python allocation peak of every stage
+    builder_module.register()
+    builder = builder_module.IncrementalBuilder(stages, on_finished=report_memory, trace_memory=True)
+    builder.start()
+    return builder
 
 
 if __name__ == "__main__":